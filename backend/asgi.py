@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Под ASGI запросы к AI обслуживают асинхронные views (см. ASYNC_AI_VIEWS)
+os.environ.setdefault('ASYNC_AI_VIEWS', 'True')
 
 application = get_asgi_application()
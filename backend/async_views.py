@@ -0,0 +1,80 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """JSON ответ, байт в байт совпадающий с ответом DRF (JSONRenderer)"""
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, content_type='application/json', headers=headers
+    )
+
+
+async def authenticate(request):
+    """Аутентификация классами из REST_FRAMEWORK (ORM выполняется в потоке)"""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        authenticator = authentication_class()
+        result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def async_api_view(methods):
+    """
+    Асинхронный аналог `@api_view` для эндпоинтов, которые ждут AI провайдера.
+
+    Под ASGI (backend.asgi) запрос, ожидающий ответа модели, не занимает
+    поток: воркер держит одновременно столько запросов, сколько позволяет
+    провайдер. Аутентификация, формат ошибок и JSON совпадают с DRF;
+    view получает `request.user` и разобранный `request.data` и возвращает
+    HttpResponse (см. `json_response`).
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                user = await authenticate(request)
+                if user is None:
+                    raise exceptions.NotAuthenticated()
+                request.user = user
+                request.data = _parse_json(request)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = {}
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    status_code = status.HTTP_401_UNAUTHORIZED
+                    authenticate_header = _authenticate_header(request)
+                    if authenticate_header:
+                        headers['WWW-Authenticate'] = authenticate_header
+                else:
+                    status_code = exc.status_code
+                if isinstance(exc, exceptions.MethodNotAllowed):
+                    headers['Allow'] = ', '.join(methods)
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return json_response(detail, status=status_code, headers=headers)
+
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+def _parse_json(request):
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise exceptions.ParseError(f'JSON parse error - {exc}')
+
+
+def _authenticate_header(request):
+    classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    return classes[0]().authenticate_header(request) if classes else None
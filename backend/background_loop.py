@@ -0,0 +1,79 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """
+    Постоянный цикл событий в фоновом потоке процесса.
+
+    Синхронный код (WSGI воркеры, management команды) выполняет корутины
+    через `run()`, а не создает и закрывает новый цикл на каждый вызов:
+    клиенты и соединения, привязанные к циклу, переиспользуются между
+    запросами. Поток запускается лениво и заново после fork (gunicorn --preload).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._stop_callbacks = []
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='background-event-loop', daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coro, timeout=None):
+        """Выполнить корутину в фоновом цикле и дождаться результата"""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('BackgroundLoop.run() нельзя вызывать из самого фонового цикла')
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Таймаут или прерывание вызывающего потока — отменяем корутину
+            future.cancel()
+            raise
+
+    def on_stop(self, callback):
+        """Асинхронная функция, выполняемая в цикле перед его остановкой (закрытие клиентов)"""
+        self._stop_callbacks.append(callback)
+        return callback
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = self._thread = None
+        for callback in self._stop_callbacks:
+            try:
+                asyncio.run_coroutine_threadsafe(callback(), loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f'Ошибка при остановке фонового цикла: {e}')
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+
+background_loop = BackgroundLoop()
+atexit.register(background_loop.stop)
+
+
+def run_sync(coro, timeout=None):
+    """Выполнить корутину из синхронного кода в общем фоновом цикле процесса"""
+    return background_loop.run(coro, timeout)
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def collection_etag(request, version):
+    """Слабый ETag для списка: пользователь, URL с параметрами и версия коллекции"""
+    source = f'{request.user.pk}|{request.get_full_path()}|{version!r}'
+    return 'W/' + quote_etag(hashlib.sha1(source.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    """Слабое сравнение с If-None-Match"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    client_etags = parse_etags(header)
+    return '*' in client_etags or etag.removeprefix('W/') in (
+        value.removeprefix('W/') for value in client_etags
+    )
+
+
+def conditional_list(method):
+    """
+    Условный GET для списочных действий ViewSet.
+
+    Версия коллекции берется из `view.get_collection_version()` (например,
+    максимальный updated_at и количество строк — один агрегатный запрос по
+    индексу). Если клиент прислал совпадающий If-None-Match, отвечаем 304 без
+    выборки строк и сериализации.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return method(self, request, *args, **kwargs)
+
+        # Версию считаем до выборки: если данные изменятся во время запроса,
+        # клиент получит устаревший ETag и обновит список при следующем опросе
+        etag = collection_etag(request, self.get_collection_version())
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    return wrapper
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+from rest_framework.settings import api_settings
+
+
+def _is_iso(field, default):
+    output_format = getattr(field, 'format', default)
+    return output_format is not None and output_format.lower() == drf_fields.ISO_8601
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _str(value):
+    return str(value)
+
+
+class ValuesSerializer:
+    """
+    Быстрый read-only путь для больших списков.
+
+    Словари ответа строятся прямо из строк `.values()` — без создания
+    экземпляров модели и без вызова `to_representation` каждого поля DRF.
+    Результат совпадает с `serializer_class(queryset, many=True).data`
+    байт в байт после рендеринга в JSON. Поддерживаются только простые
+    поля модели; для остальных используется `to_representation` самого поля.
+    """
+
+    # Поля, которые для значений из БД возвращают значение как есть
+    PASSTHROUGH_FIELDS = (
+        drf_fields.BooleanField,
+        drf_fields.IntegerField,
+        drf_fields.ChoiceField,
+    )
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._fields = None
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            self._fields = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, drf_fields.SerializerMethodField) or '.' in field.source or field.source == '*':
+                    raise ImproperlyConfigured(
+                        f'{self.serializer_class.__name__}.{name}: поле не поддерживается быстрым сериализатором'
+                    )
+                self._fields.append((name, field.source, field))
+        return self._fields
+
+    def values(self, queryset):
+        """Выборка только нужных колонок"""
+        return queryset.values(*(source for _, source, _ in self.fields))
+
+    def _converters(self):
+        # Как DateTimeField.default_timezone(): текущая зона запроса при USE_TZ
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        converters = []
+        for name, source, field in self.fields:
+            if isinstance(field, drf_fields.UUIDField) and field.uuid_format == 'hex_verbose':
+                convert = _str
+            elif isinstance(field, drf_fields.DateTimeField) and _is_iso(field, api_settings.DATETIME_FORMAT):
+                convert = self._datetime_converter(getattr(field, 'timezone', tz))
+            elif isinstance(field, drf_fields.DateField) and _is_iso(field, api_settings.DATE_FORMAT):
+                convert = _isoformat
+            elif isinstance(field, drf_fields.TimeField) and _is_iso(field, api_settings.TIME_FORMAT):
+                convert = _isoformat
+            elif isinstance(field, drf_fields.CharField):
+                convert = _str
+            elif isinstance(field, self.PASSTHROUGH_FIELDS):
+                convert = None
+            elif isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+                # `.values()` по внешнему ключу уже возвращает первичный ключ
+                convert = None
+            else:
+                convert = field.to_representation
+            converters.append((name, source, convert))
+        return converters
+
+    @staticmethod
+    def _datetime_converter(tz):
+        def convert(value):
+            if tz is not None:
+                value = value.astimezone(tz) if value.tzinfo is not None else timezone.make_aware(value, tz)
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+    def serialize(self, rows):
+        """Список словарей ответа из строк `.values()`"""
+        converters = self._converters()
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in converters:
+                value = row[source]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
@@ -0,0 +1,64 @@
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently as PostgresAddIndexConcurrently,
+    NotInTransactionMixin,
+)
+from django.db.migrations.operations import AddConstraint, AddIndex
+from django.db.models import UniqueConstraint
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY на PostgreSQL и обычный CREATE INDEX на
+    остальных базах (SQLite в разработке), где CONCURRENTLY не поддерживается.
+
+    Миграция с этой операцией должна быть объявлена с `atomic = False`.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AddUniqueConstraintConcurrently(NotInTransactionMixin, AddConstraint):
+    """
+    Уникальное ограничение по полям без блокировки записи на PostgreSQL:
+    индекс строится CREATE UNIQUE INDEX CONCURRENTLY, затем становится
+    ограничением (ADD CONSTRAINT ... UNIQUE USING INDEX — без повторной
+    проверки таблицы). На остальных базах — обычный AddConstraint.
+
+    Миграция с этой операцией должна быть объявлена с `atomic = False`.
+    """
+
+    def __init__(self, model_name, constraint):
+        if not isinstance(constraint, UniqueConstraint) or not constraint.fields or any((
+            constraint.condition, constraint.expressions, constraint.include, constraint.deferrable,
+        )):
+            raise TypeError(
+                'AddUniqueConstraintConcurrently поддерживает только UniqueConstraint по полям'
+            )
+        super().__init__(model_name, constraint)
+
+    def describe(self):
+        return f'Concurrently create unique constraint {self.constraint.name} on model {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in self.constraint.fields)
+        schema_editor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({columns})')
+        schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}')
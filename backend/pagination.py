@@ -0,0 +1,163 @@
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по составному ключу сортировки.
+
+    Позиция в выборке кодируется значениями полей `ordering` последней
+    отданной строки, поэтому следующая страница выбирается условием
+    `(a, b, id) > (...)` по индексу, а не через OFFSET. Токены стабильны:
+    вставка или удаление строк не сдвигает уже выданные страницы.
+
+    Пагинация включается только если клиент передал `cursor` или
+    `page_size`, иначе ответ остается простым списком, как раньше.
+
+    `extra_rows` — строки, которых нет в БД (например, вычисленные
+    повторения задач); они вливаются в страницу по тому же ключу
+    сортировки. Поддерживается только сортировка по возрастанию.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def is_requested(self, request):
+        """Клиент явно запросил постраничную выдачу"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None, extra_rows=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+
+        position = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        if extra_rows:
+            rows = self.merge_rows(rows, extra_rows, position)[:self.page_size + 1]
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.get_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_position(self, row):
+        """Значения ключа сортировки для строки выборки (модель или словарь `.values()`)"""
+        if isinstance(row, dict):
+            return [row[name.lstrip('-')] for name in self.ordering]
+        return [getattr(row, name.lstrip('-')) for name in self.ordering]
+
+    def merge_rows(self, rows, extra_rows, position=None):
+        """Слияние отсортированных строк выборки со строками вне БД по ключу сортировки"""
+        if any(name.startswith('-') for name in self.ordering):
+            raise ValueError('extra_rows поддерживаются только для сортировки по возрастанию')
+        key = self.get_position
+        if position is not None:
+            extra_rows = [row for row in extra_rows if key(row) > position]
+        return list(heapq.merge(rows, sorted(extra_rows, key=key), key=key))
+
+    def encode_cursor(self, position):
+        payload = json.dumps([str(value) for value in position], separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def _after(self, position):
+        """Условие «строго после позиции» для составного ключа сортировки"""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор следующей страницы',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Количество элементов на странице',
+                'schema': {'type': 'integer'},
+            },
+        ]
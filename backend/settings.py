@@ -183,6 +183,27 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# По умолчанию локальный кэш процесса; для нескольких воркеров можно указать
+# общий бэкенд (например, django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='tudushka-default'),
+    },
+    # Ответы AI, общие для всех пользователей (tasks.description_cache).
+    # Локальный кэш вытесняет давно не использованные записи сверх MAX_ENTRIES;
+    # для Redis размер ограничивается политикой maxmemory (allkeys-lru)
+    'ai': {
+        'BACKEND': config('AI_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('AI_CACHE_LOCATION', default='tudushka-ai'),
+        'TIMEOUT': config('AI_DESCRIPTION_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int),
+    },
+}
+if CACHES['ai']['BACKEND'].endswith('LocMemCache'):
+    CACHES['ai']['OPTIONS'] = {'MAX_ENTRIES': config('AI_CACHE_MAX_ENTRIES', default=5000, cast=int)}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
@@ -192,10 +213,92 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.JSONParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Кэши аутентификации сбрасываются сигналами при удалении токена и изменении
+# профиля. Локальный кэш процесса сбрасывается только в том процессе, где
+# произошло изменение, поэтому с ним кэши аутентификации по умолчанию
+# выключены (0): включайте их только с общим бэкендом (Redis, Memcached)
+# или при единственном процессе
+AUTH_CACHE_SHARED = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+# Сколько секунд (не дольше срока действия initData) повторный вход с тем же
+# initData отдает выданный токен из кэша без проверки подписи и запросов к БД
+TELEGRAM_AUTH_CACHE_TIMEOUT = config(
+    'TELEGRAM_AUTH_CACHE_TIMEOUT', default=3600 if AUTH_CACHE_SHARED else 0, cast=int
+)
+
+# Время жизни кэша токенов с пользователем и профилем (секунды)
+AUTH_TOKEN_CACHE_TIMEOUT = config(
+    'AUTH_TOKEN_CACHE_TIMEOUT', default=300 if AUTH_CACHE_SHARED else 0, cast=int
+)
+
+# Курсорная пагинация задач (включается параметрами cursor/page_size)
+TASKS_PAGE_SIZE = config('TASKS_PAGE_SIZE', default=50, cast=int)
+TASKS_MAX_PAGE_SIZE = config('TASKS_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Максимальная длина периода для агрегированного календаря задач
+TASKS_CALENDAR_MAX_DAYS = config('TASKS_CALENDAR_MAX_DAYS', default=366, cast=int)
+
+# Время жизни кэша допустимых приоритетов пользователя (секунды)
+TASKS_PRIORITY_CACHE_TIMEOUT = config('TASKS_PRIORITY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Максимальное количество операций в одном пакетном запросе к задачам
+TASKS_BULK_MAX_OPERATIONS = config('TASKS_BULK_MAX_OPERATIONS', default=500, cast=int)
+
+# Дельта-синхронизация: срок хранения отметок об удалении (дни)
+# и перекрытие окна изменений для транзакций, закоммиченных с задержкой (секунды)
+TASKS_SYNC_TOMBSTONE_RETENTION_DAYS = config('TASKS_SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+TASKS_SYNC_OVERLAP_SECONDS = config('TASKS_SYNC_OVERLAP_SECONDS', default=5, cast=int)
+
+# Курсорная пагинация истории чата: последние N сообщений, затем более старые
+CHAT_MESSAGES_PAGE_SIZE = config('CHAT_MESSAGES_PAGE_SIZE', default=50, cast=int)
+CHAT_MESSAGES_MAX_PAGE_SIZE = config('CHAT_MESSAGES_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Асинхронные views для запросов к AI (send_message, generate_description).
+# Включается в backend.asgi; под WSGI остаются синхронные действия ViewSet,
+# которые выполняют корутины в общем фоновом цикле событий процесса
+ASYNC_AI_VIEWS = config('ASYNC_AI_VIEWS', default=False, cast=bool)
+
+# Очередь AI задач (manage.py run_ai_worker): аренда задачи воркером (секунды),
+# число попыток, одновременных задач на воркер и интервал опроса очереди (секунды)
+AI_JOBS_LEASE_SECONDS = config('AI_JOBS_LEASE_SECONDS', default=120, cast=int)
+AI_JOBS_MAX_ATTEMPTS = config('AI_JOBS_MAX_ATTEMPTS', default=3, cast=int)
+# Пауза перед повтором упавшей задачи (секунды), с каждой попыткой удваивается
+AI_JOBS_RETRY_DELAY = config('AI_JOBS_RETRY_DELAY', default=10, cast=int)
+AI_WORKER_CONCURRENCY = config('AI_WORKER_CONCURRENCY', default=20, cast=int)
+AI_WORKER_POLL_INTERVAL = config('AI_WORKER_POLL_INTERVAL', default=1.0, cast=float)
+
+# HTTP клиенты AI провайдеров: пул keep-alive соединений на процесс, лимиты и
+# таймауты (секунды) по провайдерам; HTTP/2 требует пакета h2 (httpx[http2])
+AI_HTTP2 = config('AI_HTTP2', default=False, cast=bool)
+AI_HTTP_KEEPALIVE_EXPIRY = config('AI_HTTP_KEEPALIVE_EXPIRY', default=60.0, cast=float)
+AI_HTTP_CLIENTS = {
+    'openai': {
+        'max_connections': config('AI_OPENAI_MAX_CONNECTIONS', default=50, cast=int),
+        'max_keepalive_connections': config('AI_OPENAI_MAX_KEEPALIVE', default=20, cast=int),
+        'timeout': config('AI_OPENAI_TIMEOUT', default=60.0, cast=float),
+        'connect_timeout': config('AI_OPENAI_CONNECT_TIMEOUT', default=5.0, cast=float),
+    },
+    'perplexity': {
+        'max_connections': config('AI_PERPLEXITY_MAX_CONNECTIONS', default=50, cast=int),
+        'max_keepalive_connections': config('AI_PERPLEXITY_MAX_KEEPALIVE', default=20, cast=int),
+        'timeout': config('AI_PERPLEXITY_TIMEOUT', default=30.0, cast=float),
+        'connect_timeout': config('AI_PERPLEXITY_CONNECT_TIMEOUT', default=5.0, cast=float),
+    },
+}
+
+# Контекст разговора для AI (chat.context): бюджет токенов истории по моделям,
+# сколько последних сообщений читать из БД и размер сводки старых реплик
+AI_CONTEXT_TOKEN_BUDGETS = {
+    'chatgpt': config('AI_CONTEXT_TOKENS_CHATGPT', default=4000, cast=int),
+    'perplexity': config('AI_CONTEXT_TOKENS_PERPLEXITY', default=8000, cast=int),
+}
+AI_CONTEXT_MAX_MESSAGES = config('AI_CONTEXT_MAX_MESSAGES', default=40, cast=int)
+AI_CONTEXT_SUMMARY_TOKENS = config('AI_CONTEXT_SUMMARY_TOKENS', default=500, cast=int)
+
 # CORS settings for React frontend
 if DEBUG:
     # Development CORS settings
@@ -1,15 +1,29 @@
 import openai
 import httpx
 import json
-from typing import Dict, Optional, Any
+import asyncio
+import importlib.util
+import weakref
+from typing import AsyncIterator, Dict, Optional, Any
 from django.conf import settings
 from cryptography.fernet import Fernet
+from backend.background_loop import background_loop
 import base64
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Ответы-ошибки сервиса начинаются с этого символа
+ERROR_PREFIX = "❌"
+
+
+def is_error_response(text: str) -> bool:
+    """Ответ сервиса — сообщение об ошибке, а не ответ модели"""
+    return text.startswith(ERROR_PREFIX)
+
+
 class AIServiceError(Exception):
     """Базовое исключение для AI сервиса"""
     pass
@@ -26,6 +40,55 @@ class AIService:
     def __init__(self):
         # Ключ шифрования для API ключей (должен быть в настройках Django)
         self._encryption_key = self._get_encryption_key()
+        # Долгоживущие HTTP клиенты провайдеров по циклам событий: пул соединений
+        # httpx привязан к циклу, в котором создан (фоновый цикл, ASGI, воркер)
+        self._clients = weakref.WeakKeyDictionary()
+        # Выполняющиеся запросы к провайдерам по циклам событий (single-flight)
+        self._in_flight = weakref.WeakKeyDictionary()
+    
+    def _loop_clients(self) -> dict:
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            clients = self._clients[loop] = {'http': {}, 'openai': {}}
+        return clients
+    
+    def _http_client(self, provider: str) -> httpx.AsyncClient:
+        """HTTP клиент провайдера с keep-alive пулом соединений (один на цикл событий)"""
+        clients = self._loop_clients()['http']
+        client = clients.get(provider)
+        if client is None:
+            options = settings.AI_HTTP_CLIENTS[provider]
+            client = clients[provider] = httpx.AsyncClient(
+                http2=_http2_enabled(),
+                limits=httpx.Limits(
+                    max_connections=options['max_connections'],
+                    max_keepalive_connections=options['max_keepalive_connections'],
+                    keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(options['timeout'], connect=options['connect_timeout']),
+            )
+        return client
+    
+    def _openai_client(self) -> openai.AsyncOpenAI:
+        """Клиент OpenAI поверх общего HTTP клиента (кешируется по API ключу)"""
+        api_key = self.get_admin_api_key("chatgpt")
+        clients = self._loop_clients()['openai']
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = openai.AsyncOpenAI(
+                api_key=api_key,
+                http_client=self._http_client("openai"),
+                timeout=settings.AI_HTTP_CLIENTS["openai"]["timeout"],
+            )
+        return client
+    
+    async def aclose(self):
+        """Закрыть HTTP клиенты текущего цикла событий (при остановке воркера)"""
+        clients = self._clients.pop(asyncio.get_running_loop(), None)
+        if clients:
+            for client in clients['http'].values():
+                await client.aclose()
     
     def _get_encryption_key(self) -> bytes:
         """Получить ключ шифрования из настроек Django"""
@@ -89,10 +152,57 @@ class AIService:
         message: str, 
         conversation_history: list = None
     ) -> str:
-        """Генерация ответа с использованием выбранной AI модели"""
+        """
+        Генерация ответа с использованием выбранной AI модели.
+        
+        Одинаковые одновременные запросы (модель, промпт, история) разделяют
+        один запрос к провайдеру: остальные вызовы ждут его результата.
+        Отмена одного из ожидающих не прерывает запрос для остальных; он
+        отменяется, когда ушел последний ожидающий.
+        """
         model = user_profile.ai_model
         personality = user_profile.ai_personality or "Ты полезный AI ассистент."
         
+        in_flight = self._in_flight.setdefault(asyncio.get_running_loop(), {})
+        key = self._request_key(model, personality, message, conversation_history)
+        entry = in_flight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._generate_response(
+                user_profile, model, personality, message, conversation_history
+            ))
+            entry = in_flight[key] = {'task': task, 'waiters': 0}
+            task.add_done_callback(lambda _: self._forget(in_flight, key, entry))
+        
+        entry['waiters'] += 1
+        try:
+            # Ошибки провайдера получают все ожидающие; отмена ожидающего до запроса не доходит
+            return await asyncio.shield(entry['task'])
+        finally:
+            entry['waiters'] -= 1
+            if entry['waiters'] == 0 and not entry['task'].done():
+                # Результат больше никому не нужен; новые вызовы начнут свой запрос
+                self._forget(in_flight, key, entry)
+                entry['task'].cancel()
+    
+    @staticmethod
+    def _forget(in_flight: dict, key: str, entry: dict):
+        if in_flight.get(key) is entry:
+            del in_flight[key]
+    
+    @staticmethod
+    def _request_key(model: str, personality: str, message: str, conversation_history: list = None) -> str:
+        payload = json.dumps([model, personality, message, conversation_history or []], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    async def _generate_response(
+        self, 
+        user_profile, 
+        model: str, 
+        personality: str, 
+        message: str, 
+        conversation_history: list = None
+    ) -> str:
+        """Запрос к провайдеру выбранной модели (ошибки возвращаются текстом)"""
         try:
             if model == "chatgpt":
                 return await self._generate_openai_response(
@@ -111,29 +221,144 @@ class AIService:
             logger.error(f"Ошибка генерации ответа {model}: {e}")
             return f"❌ Ошибка при обращении к {model.upper()}: {str(e)}"
     
-    async def _generate_openai_response(
+    async def stream_response(
         self, 
         user_profile, 
         message: str, 
-        personality: str, 
         conversation_history: list = None
-    ) -> str:
-        """Генерация ответа через OpenAI GPT"""
-        api_key = self.get_admin_api_key("chatgpt")
-        
-        client = openai.AsyncOpenAI(api_key=api_key)
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация ответа: асинхронный генератор фрагментов текста
+        по мере их получения от провайдера. Ошибки отдаются последним
+        фрагментом в том же виде, что и в generate_response.
+        """
+        model = user_profile.ai_model
+        personality = user_profile.ai_personality or "Ты полезный AI ассистент."
         
+        try:
+            if model == "chatgpt":
+                chunks = self._stream_openai_response(message, personality, conversation_history)
+            elif model == "perplexity":
+                chunks = self._stream_perplexity_response(message, personality, conversation_history)
+            else:
+                raise AIServiceError(f"Неподдерживаемая модель: {model}")
+            async for chunk in chunks:
+                yield chunk
+                
+        except APIKeyError:
+            yield f"❌ Для использования {model.upper()} необходимо указать API ключ в настройках."
+        except Exception as e:
+            logger.error(f"Ошибка потоковой генерации ответа {model}: {e}")
+            yield f"❌ Ошибка при обращении к {model.upper()}: {str(e)}"
+    
+    def _build_messages(self, message: str, personality: str, conversation_history: list = None) -> list:
+        """Сообщения для chat completions: системный промпт, история и новый вопрос"""
         messages = [
             {"role": "system", "content": personality}
         ]
         
-        # Добавляем историю разговора
-        if conversation_history:
-            for msg in conversation_history[-10:]:  # Последние 10 сообщений
-                role = "user" if msg['sender'] == 'user' else "assistant"
-                messages.append({"role": role, "content": msg['text']})
+        # Добавляем историю разговора (уже уложенную в бюджет токенов, см. chat.context)
+        for msg in conversation_history or []:
+            if msg['sender'] == 'summary':
+                messages[0]["content"] += f"\n\nКраткое содержание более ранней части разговора:\n{msg['text']}"
+                continue
+            role = "user" if msg['sender'] == 'user' else "assistant"
+            messages.append({"role": role, "content": msg['text']})
         
         messages.append({"role": "user", "content": message})
+        return messages
+    
+    async def _stream_openai_response(
+        self, 
+        message: str, 
+        personality: str, 
+        conversation_history: list = None
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ OpenAI GPT (stream=True)"""
+        client = self._openai_client()
+        
+        try:
+            stream = await client.chat.completions.create(
+                model="gpt-4",
+                messages=self._build_messages(message, personality, conversation_history),
+                max_tokens=1000,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                    
+        except openai.AuthenticationError:
+            raise APIKeyError("Неверный OpenAI API ключ")
+        except openai.RateLimitError:
+            yield "❌ Превышен лимит запросов OpenAI. Попробуйте позже."
+        except openai.OpenAIError as e:
+            logger.error(f"OpenAI API error: {e}")
+            raise AIServiceError(f"Ошибка OpenAI API: {str(e)}")
+    
+    async def _stream_perplexity_response(
+        self, 
+        message: str, 
+        personality: str, 
+        conversation_history: list = None
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ Perplexity AI (SSE, совместимый с OpenAI формат)"""
+        api_key = self.get_admin_api_key("perplexity")
+        
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        
+        payload = {
+            "model": "llama-3.1-sonar-small-128k-online",
+            "messages": self._build_messages(message, personality, conversation_history),
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "stream": True
+        }
+        
+        try:
+            async with self._http_client("perplexity").stream(
+                "POST",
+                "https://api.perplexity.ai/chat/completions",
+                headers=headers,
+                json=payload
+            ) as response:
+                if response.status_code == 401:
+                    raise APIKeyError("Неверный Perplexity API ключ")
+                elif response.status_code == 429:
+                    yield "❌ Превышен лимит запросов Perplexity. Попробуйте позже."
+                    return
+                
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+                        
+        except httpx.HTTPError as e:
+            logger.error(f"Perplexity API error: {e}")
+            raise AIServiceError(f"Ошибка Perplexity API: {str(e)}")
+    
+    async def _generate_openai_response(
+        self, 
+        user_profile, 
+        message: str, 
+        personality: str, 
+        conversation_history: list = None
+    ) -> str:
+        """Генерация ответа через OpenAI GPT"""
+        client = self._openai_client()
+        
+        messages = self._build_messages(message, personality, conversation_history)
         
         try:
             response = await client.chat.completions.create(
@@ -162,17 +387,7 @@ class AIService:
         """Генерация ответа через Perplexity AI"""
         api_key = self.get_admin_api_key("perplexity")
         
-        messages = [
-            {"role": "system", "content": personality}
-        ]
-        
-        # Добавляем историю разговора
-        if conversation_history:
-            for msg in conversation_history[-10:]:
-                role = "user" if msg['sender'] == 'user' else "assistant"
-                messages.append({"role": role, "content": msg['text']})
-        
-        messages.append({"role": "user", "content": message})
+        messages = self._build_messages(message, personality, conversation_history)
         
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -187,23 +402,21 @@ class AIService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.perplexity.ai/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 401:
-                    raise APIKeyError("Неверный Perplexity API ключ")
-                elif response.status_code == 429:
-                    return "❌ Превышен лимит запросов Perplexity. Попробуйте позже."
-                
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-                
+            response = await self._http_client("perplexity").post(
+                "https://api.perplexity.ai/chat/completions",
+                headers=headers,
+                json=payload
+            )
+            
+            if response.status_code == 401:
+                raise APIKeyError("Неверный Perplexity API ключ")
+            elif response.status_code == 429:
+                return "❌ Превышен лимит запросов Perplexity. Попробуйте позже."
+            
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+            
         except httpx.HTTPError as e:
             logger.error(f"Perplexity API error: {e}")
             raise AIServiceError(f"Ошибка Perplexity API: {str(e)}")
@@ -231,5 +444,17 @@ class AIService:
         return {"valid": True}
 
 
+def _http2_enabled() -> bool:
+    """HTTP/2 по настройке AI_HTTP2, если установлен пакет h2 (httpx[http2])"""
+    if not settings.AI_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("AI_HTTP2 включен, но пакет h2 не установлен — используется HTTP/1.1")
+        return False
+    return True
+
+
 # Создаем глобальный экземпляр сервиса
-ai_service = AIService()
\ No newline at end of file
+ai_service = AIService()
+# Клиенты общего фонового цикла закрываются при завершении процесса
+background_loop.on_stop(ai_service.aclose)
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Асинхронные версии эндпоинтов чата, которые ждут ответа AI провайдера.
+
+Подключаются вместо действий ViewSet при ASYNC_AI_VIEWS (включено в
+backend.asgi): ожидание модели не занимает поток воркера.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from backend.async_views import async_api_view, json_response
+from users import quota
+from . import jobs
+from .ai_service import ai_service, is_error_response
+from .models import ChatSession, ChatMessage
+from .context import build_context
+from .serializers import CreateChatMessageSerializer, message_values_serializer
+from .views import chat_limit_error, sent_messages_data, use_chat_request, wants_full_history
+
+logger = logging.getLogger(__name__)
+
+
+@async_api_view(['POST'])
+async def send_message(request, pk):
+    """Отправить сообщение в сессию (с автоматическим AI ответом); ответ как у ChatSessionViewSet.send_message"""
+    session = await ChatSession.objects.filter(pk=pk, user=request.user).afirst()
+    if session is None:
+        raise NotFound()
+    
+    serializer = CreateChatMessageSerializer(
+        data=request.data,
+        context={'session': session, 'request': request}
+    )
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    profile, allowed = await sync_to_async(use_chat_request)(request.user)
+    if not allowed:
+        return json_response(chat_limit_error(profile), status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    if jobs.wants_background(request):
+        data = await sync_to_async(jobs.enqueue_chat_reply)(session, serializer.validated_data['text'])
+        return json_response(data, status=status.HTTP_202_ACCEPTED)
+    
+    user_message = await ChatMessage.objects.acreate(
+        session=session,
+        text=serializer.validated_data['text'],
+        sender='user'
+    )
+    try:
+        history = await sync_to_async(build_context)(session, profile.ai_model, exclude_id=user_message.id)
+        ai_response = await ai_service.generate_response(
+            user_profile=profile,
+            message=user_message.text,
+            conversation_history=history
+        )
+    except Exception as e:
+        logger.error(f"Ошибка генерации AI ответа: {e}")
+        ai_response = f"❌ Произошла ошибка при генерации ответа: {str(e)}"
+    if is_error_response(ai_response):
+        await sync_to_async(quota.refund)(profile, quota.CHAT_REQUESTS)
+    ai_message = await ChatMessage.objects.acreate(session=session, text=ai_response, sender='ai')
+    
+    if wants_full_history(request):
+        messages = [row async for row in message_values_serializer.values(session.messages.all())]
+        return json_response(message_values_serializer.serialize(messages), status=status.HTTP_201_CREATED)
+    return json_response(sent_messages_data(user_message, ai_message), status=status.HTTP_201_CREATED)
@@ -0,0 +1,115 @@
+"""
+Контекст разговора для AI с бюджетом токенов.
+
+История читается по индексу (session, created_at, id) в обратном порядке
+с LIMIT и упаковывается от новых сообщений к старым, пока помещается в
+бюджет модели. Реплики, вытесненные из контекста, сворачиваются в
+короткую сводку, которая хранится в сессии: размер запроса к провайдеру
+не растет с длиной чата.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import ChatSession
+
+# Служебные токены разметки на одно сообщение chat completions
+MESSAGE_OVERHEAD_TOKENS = 4
+# Сколько символов реплики попадает в сводку
+SUMMARY_LINE_LENGTH = 200
+SUMMARY_SENDERS = {'user': 'Пользователь', 'ai': 'AI'}
+
+
+def estimate_tokens(text):
+    """Грубая оценка числа токенов: ~4 символа на токен"""
+    return len(text) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def token_budget(model):
+    budgets = settings.AI_CONTEXT_TOKEN_BUDGETS
+    return budgets.get(model, min(budgets.values()))
+
+
+def build_context(session, model, exclude_id=None):
+    """
+    История для AI в хронологическом порядке. Первым элементом может идти
+    сводка ранней части разговора ({'sender': 'summary', ...}).
+    """
+    summary = session.context_summary
+    messages = session.messages.order_by('-created_at', '-id')
+    if exclude_id is not None:
+        messages = messages.exclude(id=exclude_id)
+    if session.context_summary_until is not None:
+        messages = messages.filter(created_at__gt=session.context_summary_until)
+    limit = settings.AI_CONTEXT_MAX_MESSAGES
+    rows = list(messages.values_list('sender', 'text', 'created_at', 'id')[:limit])
+
+    # Место под сводку резервируем всегда, чтобы ее появление не вытесняло реплики повторно
+    budget = token_budget(model) - settings.AI_CONTEXT_SUMMARY_TOKENS
+    used = 0
+    kept = 0
+    for _, text, *_ in rows:
+        cost = estimate_tokens(text)
+        if used + cost > budget:
+            break
+        used += cost
+        kept += 1
+
+    # Не поместившиеся старые реплики уходят в сводку
+    overflow = rows[kept:]
+    if len(rows) == limit:
+        # За окном могут остаться еще не свернутые реплики — их тоже в сводку
+        overflow += _older_rows(messages, rows[-1])
+    if overflow:
+        summary = fold_summary(summary, reversed(overflow))
+        _save_summary(session, summary, until=overflow[0][2])
+
+    history = [{'sender': sender, 'text': text} for sender, text, *_ in reversed(rows[:kept])]
+    if summary:
+        history.insert(0, {'sender': 'summary', 'text': summary})
+    return history
+
+
+def _older_rows(messages, oldest):
+    """
+    Реплики старше окна (от новых к старым). Читаем пачками и
+    останавливаемся, когда их строк уже хватает на всю сводку: более
+    старые fold_summary все равно отбросил бы.
+    """
+    _, _, created_at, pk = oldest
+    messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    limit = settings.AI_CONTEXT_MAX_MESSAGES
+    rows = []
+    tokens = 0
+    while tokens <= settings.AI_CONTEXT_SUMMARY_TOKENS:
+        batch = list(messages.values_list('sender', 'text', 'created_at', 'id')[len(rows):len(rows) + limit])
+        rows += batch
+        tokens += sum(estimate_tokens(text[:SUMMARY_LINE_LENGTH]) for _, text, *_ in batch)
+        if len(batch) < limit:
+            break
+    return rows
+
+
+def fold_summary(summary, rows):
+    """
+    Дописать реплики в сводку. Сводка — по строке на реплику (начало
+    текста); при превышении AI_CONTEXT_SUMMARY_TOKENS отбрасываются самые
+    старые строки. Без обращения к модели, чтобы не добавлять задержку.
+    """
+    lines = summary.splitlines() if summary else []
+    for sender, text, *_ in rows:
+        line = ' '.join(text.split())
+        if len(line) > SUMMARY_LINE_LENGTH:
+            line = line[:SUMMARY_LINE_LENGTH] + '...'
+        lines.append(f'{SUMMARY_SENDERS.get(sender, sender)}: {line}')
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > settings.AI_CONTEXT_SUMMARY_TOKENS:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def _save_summary(session, summary, until):
+    # Условное обновление: если параллельный запрос уже свернул историю дальше, не откатываем
+    ChatSession.objects.filter(
+        Q(context_summary_until__isnull=True) | Q(context_summary_until__lt=until), pk=session.pk
+    ).update(context_summary=summary, context_summary_until=until)
+    session.context_summary = summary
+    session.context_summary_until = until
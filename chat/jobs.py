@@ -0,0 +1,217 @@
+"""
+Очередь AI задач в таблице AIJob.
+
+Веб-запрос вызывает `enqueue()` и отвечает 202 с id задачи; воркер
+(`manage.py run_ai_worker`) забирает задачи `claim_jobs()` и выполняет
+`run_job()` в своем цикле событий, так что время ответа провайдера не
+занимает веб-воркеры.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users import quota
+from .ai_service import is_error_response
+from .models import AIJob, ChatMessage, ChatSession
+from .context import build_context
+from .serializers import AIJobSerializer, ChatMessageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def wants_background(request):
+    """Клиент попросил выполнить AI запрос в фоне (?background=1)"""
+    return request.GET.get('background') in ('1', 'true')
+
+
+def enqueue(user_id, kind, payload):
+    """Поставить задачу в очередь"""
+    return AIJob.objects.create(user_id=user_id, kind=kind, payload=payload)
+
+
+def enqueue_chat_reply(session, text):
+    """Сохранить сообщение пользователя и поставить ответ AI в очередь; данные ответа 202"""
+    with transaction.atomic():
+        user_message = ChatMessage.objects.create(session=session, text=text, sender='user')
+        job = enqueue(session.user_id, 'chat_reply', {
+            'session_id': str(session.pk),
+            'message_id': str(user_message.pk),
+        })
+    return {'job': AIJobSerializer(job).data, 'message': ChatMessageSerializer(user_message).data}
+
+
+def enqueue_task_description(user_id, title, language):
+    """Поставить генерацию описания задачи в очередь; данные ответа 202"""
+    job = enqueue(user_id, 'task_description', {'title': title, 'language': language})
+    return {'job': AIJobSerializer(job).data}
+
+
+def _claimable(now):
+    due = Q(run_after__isnull=True) | Q(run_after__lte=now)
+    return (Q(status='queued') & due) | Q(status='running', locked_until__lt=now)
+
+
+def claim_jobs(worker, limit):
+    """
+    Забрать до `limit` задач: из очереди (кроме отложенных до `run_after`)
+    и с истекшей арендой (воркер упал).
+
+    Кандидаты выбираются по индексу (status, created_at), на PostgreSQL с
+    FOR UPDATE SKIP LOCKED, чтобы параллельные воркеры не ждали друг друга.
+    Захват — условный UPDATE с тем же условием: задача достается только
+    одному воркеру.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = AIJob.objects.filter(_claimable(now)).order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        AIJob.objects.filter(_claimable(now), id__in=ids).update(
+            status='running',
+            worker=worker,
+            locked_until=now + timedelta(seconds=settings.AI_JOBS_LEASE_SECONDS),
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        AIJob.objects.filter(id__in=ids, status='running', worker=worker)
+        .select_related('user__profile')
+        .order_by('created_at')
+    )
+
+
+def _owned(job, worker):
+    # Задача все еще наша: ее не забрал другой воркер после истечения аренды
+    return AIJob.objects.filter(pk=job.pk, status='running', worker=worker)
+
+
+def _finish(job, worker, **fields):
+    return _owned(job, worker).update(locked_until=None, **fields)
+
+
+def _renew(job, worker):
+    return _owned(job, worker).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.AI_JOBS_LEASE_SECONDS)
+    )
+
+
+def _complete(job, worker, save):
+    """
+    Записать результат, если задача все еще наша. Условный UPDATE блокирует
+    строку задачи до конца транзакции, а `save()` (сообщение AI, возврат
+    лимита) выполняется в той же транзакции: воркер, забравший задачу после
+    истечения аренды, не запишет второй ответ.
+    """
+    with transaction.atomic():
+        if not _finish(job, worker, status='done', error='', finished_at=timezone.now()):
+            return False
+        AIJob.objects.filter(pk=job.pk).update(result=save())
+    return True
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: AI_JOBS_RETRY_DELAY, 2x, 4x, ..."""
+    return timedelta(seconds=settings.AI_JOBS_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+
+async def _keep_lease(job, worker):
+    # Продлеваем аренду, пока ждем провайдера: долгий ответ не отдаст задачу другому воркеру
+    while True:
+        await asyncio.sleep(settings.AI_JOBS_LEASE_SECONDS / 3)
+        if not await sync_to_async(_renew)(job, worker):
+            return
+
+
+async def run_job(job, worker):
+    """
+    Выполнить задачу и записать результат или ошибку. Обработчик возвращает
+    функцию сохранения результата, она выполняется только пока задача наша.
+    """
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f'Неизвестный тип задачи: {job.kind}')
+        lease = asyncio.create_task(_keep_lease(job, worker))
+        try:
+            save = await handler(job)
+        finally:
+            lease.cancel()
+    except Exception as e:
+        logger.exception(f'AI задача {job.pk} ({job.kind}) завершилась ошибкой')
+        # Повторяем с нарастающей паузой, пока не исчерпаны попытки
+        if job.attempts >= settings.AI_JOBS_MAX_ATTEMPTS:
+            finished = await sync_to_async(_finish)(job, worker, status='failed', error=str(e), finished_at=timezone.now())
+            if finished and job.kind in QUOTA_KINDS:
+                # Лимит списан при постановке в очередь — возвращаем
+                await sync_to_async(quota.refund)(job.user.profile, QUOTA_KINDS[job.kind])
+        else:
+            await sync_to_async(_finish)(
+                job, worker, status='queued', error=str(e),
+                run_after=timezone.now() + retry_delay(job.attempts),
+            )
+        return
+    if not await sync_to_async(_complete)(job, worker, save):
+        logger.warning(f'AI задача {job.pk} ({job.kind}) забрана другим воркером, результат не записан')
+
+
+async def _chat_reply(job):
+    """Ответ AI на сообщение пользователя в сессии"""
+    from .ai_service import ai_service
+
+    session = await ChatSession.objects.aget(pk=job.payload['session_id'], user=job.user)
+    user_message = await ChatMessage.objects.aget(pk=job.payload['message_id'], session=session)
+    history = await sync_to_async(build_context)(session, job.user.profile.ai_model, exclude_id=user_message.id)
+    ai_response = await ai_service.generate_response(
+        user_profile=job.user.profile,
+        message=user_message.text,
+        conversation_history=history
+    )
+
+    def save():
+        ai_message = ChatMessage.objects.create(session=session, text=ai_response, sender='ai')
+        if is_error_response(ai_response):
+            quota.refund(job.user.profile, quota.CHAT_REQUESTS)
+        return {'message': ChatMessageSerializer(ai_message).data}
+    return save
+
+
+async def _task_description(job):
+    """Описание задачи по заголовку (лимит списан при постановке в очередь)"""
+    from tasks.ai_task_service import task_ai_service
+
+    profile = job.user.profile
+    description = await task_ai_service.agenerate_task_description(
+        user_profile=profile,
+        task_title=job.payload['title'],
+        language=job.payload.get('language', 'ru')
+    )
+
+    def save():
+        if is_error_response(description):
+            quota.refund(profile, quota.DESCRIPTIONS)
+        return {
+            'description': description,
+            'remaining_uses': profile.ai_descriptions_limit - profile.ai_descriptions_used
+        }
+    return save
+
+
+HANDLERS = {
+    'chat_reply': _chat_reply,
+    'task_description': _task_description,
+}
+
+# Какой лимит списан за задачу каждого типа
+QUOTA_KINDS = {
+    'chat_reply': quota.CHAT_REQUESTS,
+    'task_description': quota.DESCRIPTIONS,
+}
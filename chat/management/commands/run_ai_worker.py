@@ -0,0 +1,67 @@
+import asyncio
+import os
+import signal
+import socket
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from chat.ai_service import ai_service
+from chat.jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'AI воркер: забирает задачи из таблицы AIJob и выполняет их в цикле событий '
+        '(до --concurrency одновременных запросов к провайдерам).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.AI_WORKER_CONCURRENCY)
+        parser.add_argument('--poll-interval', type=float, default=settings.AI_WORKER_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Выполнить задачи из очереди и завершиться')
+
+    def handle(self, *args, **options):
+        self.worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stdout.write(f'AI воркер {self.worker} запущен')
+        asyncio.run(self._run(options['concurrency'], options['poll_interval'], options['once']))
+        self.stdout.write(f'AI воркер {self.worker} остановлен')
+
+    async def _run(self, concurrency, poll_interval, once):
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            # Новые задачи не берем, начатые дорабатываем
+            loop.add_signal_handler(sig, stopping.set)
+
+        running = set()
+        while not stopping.is_set():
+            free = concurrency - len(running)
+            jobs = await sync_to_async(self._claim)(free) if free > 0 else []
+            for job in jobs:
+                task = asyncio.create_task(run_job(job, self.worker))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            if once and not jobs and not running:
+                break
+            if not jobs:
+                # Очередь пуста или все слоты заняты: ждем интервал, сигнал остановки
+                # или завершение одной из задач
+                waiters = [asyncio.ensure_future(stopping.wait()), *running]
+                await asyncio.wait(
+                    waiters, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                waiters[0].cancel()
+
+        if running:
+            await asyncio.wait(running)
+        await ai_service.aclose()
+
+    def _claim(self, limit):
+        # Долгоживущий процесс: закрываем соединения, превысившие CONN_MAX_AGE или сломанные
+        close_old_connections()
+        return claim_jobs(self.worker, limit)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+from backend.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'created_at', 'id'], name='chatmsg_session_created_idx'),
+        ),
+    ]
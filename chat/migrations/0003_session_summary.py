@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:25
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+
+
+def backfill_session_summary(apps, schema_editor):
+    """Заполняем сводку существующих сессий одним UPDATE с подзапросами"""
+    ChatSession = apps.get_model('chat', 'ChatSession')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+
+    messages = ChatMessage.objects.filter(session=OuterRef('pk'))
+    latest = messages.order_by('-created_at', '-id').annotate(
+        text_length=Length('text'),
+        preview=Case(
+            When(text_length__gt=100, then=Concat(Substr('text', 1, 100), Value('...'), output_field=models.TextField())),
+            default=F('text'),
+            output_field=models.TextField(),
+        )
+    )
+    count = messages.order_by().values('session').annotate(total=Count('id')).values('total')
+    ChatSession.objects.update(
+        message_count=Coalesce(Subquery(count), 0),
+        last_message_preview=Coalesce(Subquery(latest.values('preview')[:1]), Value('')),
+        last_message_sender=Coalesce(Subquery(latest.values('sender')[:1]), Value('')),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        last_activity_at=Coalesce(Subquery(latest.values('created_at')[:1]), F('updated_at')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_chatmessage_session_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя активность'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последнего сообщения'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=103, verbose_name='Последнее сообщение'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_sender',
+            field=models.CharField(blank=True, max_length=4, verbose_name='Отправитель последнего сообщения'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество сообщений'),
+        ),
+        migrations.RunPython(backfill_session_summary, migrations.RunPython.noop),
+    ]
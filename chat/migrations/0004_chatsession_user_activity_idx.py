@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+from backend.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0003_session_summary'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='chatsession',
+            index=models.Index(fields=['user', '-last_activity_at'], name='chatsession_user_activity_idx'),
+        ),
+    ]
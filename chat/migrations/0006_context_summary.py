@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_aijob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='context_summary',
+            field=models.TextField(blank=True, verbose_name='Сводка ранней части разговора'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='context_summary_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Сводка включает сообщения до'),
+        ),
+    ]
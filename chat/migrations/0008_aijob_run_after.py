@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_drop_redundant_fk_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aijob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Повтор не раньше'),
+        ),
+    ]
@@ -1,6 +1,13 @@
 import uuid
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Длина превью последнего сообщения в списке сессий (без многоточия)
+PREVIEW_LENGTH = 100
 
 
 class ChatSession(models.Model):
@@ -10,11 +17,24 @@ class ChatSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_sessions", verbose_name="Пользователь")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Денормализованная сводка для списка сессий (обновляется при записи сообщений)
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Количество сообщений")
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH + 3, blank=True, verbose_name="Последнее сообщение")
+    last_message_sender = models.CharField(max_length=4, blank=True, verbose_name="Отправитель последнего сообщения")
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name="Время последнего сообщения")
+    last_activity_at = models.DateTimeField(default=timezone.now, verbose_name="Последняя активность")
+    # Сводка реплик, не поместившихся в контекст AI (см. chat.context)
+    context_summary = models.TextField(blank=True, verbose_name="Сводка ранней части разговора")
+    context_summary_until = models.DateTimeField(null=True, blank=True, verbose_name="Сводка включает сообщения до")
 
     class Meta:
         verbose_name = "Сессия чата"
         verbose_name_plural = "Сессии чата"
         ordering = ["-created_at"]
+        indexes = [
+            # Список сессий по последней активности
+            models.Index(fields=["user", "-last_activity_at"], name="chatsession_user_activity_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.user.username})"
@@ -29,7 +49,8 @@ class ChatMessage(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="messages", verbose_name="Сессия")
+    # Отдельный индекс по session не нужен: его покрывает chatmsg_session_created_idx
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="messages", db_index=False, verbose_name="Сессия")
     text = models.TextField(verbose_name="Текст сообщения")
     sender = models.CharField(max_length=4, choices=SENDER_CHOICES, verbose_name="Отправитель")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время отправки")
@@ -38,6 +59,111 @@ class ChatMessage(models.Model):
         verbose_name = "Сообщение чата"
         verbose_name_plural = "Сообщения чата"
         ordering = ["created_at"]
+        indexes = [
+            # История сессии в хронологическом порядке
+            models.Index(fields=["session", "created_at", "id"], name="chatmsg_session_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.sender}: {self.text[:50]}..." if len(self.text) > 50 else f"{self.sender}: {self.text}"
+
+
+def message_preview(text):
+    """Превью сообщения для списка сессий"""
+    return text[:PREVIEW_LENGTH] + '...' if len(text) > PREVIEW_LENGTH else text
+
+
+def refresh_session_summary(session_id):
+    """
+    Пересчитать сводку сессии по сообщениям (после удаления сообщения).
+    Меняет и updated_at — по нему считается версия списков для ETag.
+    """
+    last_message = (
+        ChatMessage.objects.filter(session_id=session_id)
+        .order_by('-created_at', '-id')
+        .only('text', 'sender', 'created_at')
+        .first()
+    )
+    ChatSession.objects.filter(pk=session_id).update(
+        message_count=ChatMessage.objects.filter(session_id=session_id).count(),
+        last_message_preview=message_preview(last_message.text) if last_message else '',
+        last_message_sender=last_message.sender if last_message else '',
+        last_message_at=last_message.created_at if last_message else None,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_session_on_message_save(sender, instance, created, **kwargs):
+    """
+    Новое или измененное сообщение меняет сводку сессии.
+
+    Один UPDATE: счетчик увеличивается через F(), а поля последнего
+    сообщения меняются только если это сообщение не старше уже записанного
+    (параллельные запросы не перетирают более новое сообщение).
+    """
+    is_latest = Q(last_message_at__isnull=True) | Q(last_message_at__lte=instance.created_at)
+
+    def if_latest(value, field):
+        return Case(When(is_latest, then=Value(value)), default=F(field))
+
+    ChatSession.objects.filter(pk=instance.session_id).update(
+        message_count=F('message_count') + (1 if created else 0),
+        last_message_preview=if_latest(message_preview(instance.text), 'last_message_preview'),
+        last_message_sender=if_latest(instance.sender, 'last_message_sender'),
+        last_message_at=if_latest(instance.created_at, 'last_message_at'),
+        last_activity_at=if_latest(instance.created_at, 'last_activity_at') if created else F('last_activity_at'),
+        updated_at=timezone.now(),
+    )
+
+
+class AIJob(models.Model):
+    """
+    Задача для AI воркера (manage.py run_ai_worker).
+
+    Очередь — сама таблица: веб-запрос создает строку и сразу отвечает 202,
+    воркер забирает задачи условным UPDATE и выполняет их асинхронно, клиент
+    опрашивает статус. Внешний брокер не нужен.
+    """
+    
+    KIND_CHOICES = [
+        ('chat_reply', 'Ответ в чате'),
+        ('task_description', 'Описание задачи'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ai_jobs", verbose_name="Пользователь")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="Тип")
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='queued', verbose_name="Статус")
+    payload = models.JSONField(default=dict, verbose_name="Параметры")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попытки")
+    # Воркер, который выполняет задачу, и срок аренды: после него задачу
+    # упавшего воркера заберет другой
+    worker = models.CharField(max_length=64, blank=True, verbose_name="Воркер")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Занята до")
+    # Повтор после ошибки: задачу не забирают раньше этого времени
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name="Повтор не раньше")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало выполнения")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершение")
+
+    class Meta:
+        verbose_name = "Задача AI"
+        verbose_name_plural = "Задачи AI"
+        ordering = ["created_at"]
+        indexes = [
+            # Выборка воркером: задачи в очереди и просроченные аренды по порядку создания
+            models.Index(fields=["status", "created_at"], name="aijob_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.status} ({self.id})"
@@ -0,0 +1,25 @@
+from django.conf import settings
+
+from backend.pagination import KeysetPagination
+
+
+class MessageCursorPagination(KeysetPagination):
+    """
+    Обратная курсорная пагинация истории сессии: первая страница — последние
+    сообщения, курсор ведет к более старым. Страница выбирается по индексу
+    (session, created_at, id) в обратном порядке и отдается в хронологическом.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.CHAT_MESSAGES_PAGE_SIZE
+    max_page_size = settings.CHAT_MESSAGES_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Позиция следующей страницы считается до разворота — по самому старому сообщению
+        rows = super().paginate_queryset(queryset, request, view)
+        if rows is not None:
+            rows.reverse()
+        return rows
+
+    def cursor_before(self, message):
+        """Курсор страницы сообщений, предшествующих `message`"""
+        return self.encode_cursor(self.get_position(message))
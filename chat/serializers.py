@@ -1,7 +1,9 @@
 from rest_framework import serializers
-from .models import ChatSession, ChatMessage
+from backend.fast_serializers import ValuesSerializer
+from .models import AIJob, ChatSession, ChatMessage
+from backend.background_loop import run_sync
 from .ai_service import ai_service
-import asyncio
+from .context import build_context
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,19 +23,18 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+# Быстрый read-only путь для истории сообщений (тот же JSON, что и ChatMessageSerializer)
+message_values_serializer = ValuesSerializer(ChatMessageSerializer)
+
+
 class ChatSessionSerializer(serializers.ModelSerializer):
     """Сериализатор для сессий чата"""
     messages = ChatMessageSerializer(many=True, read_only=True)
-    message_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatSession
         fields = ['id', 'title', 'created_at', 'updated_at', 'messages', 'message_count']
-        read_only_fields = ['id', 'created_at', 'updated_at']
-        
-    def get_message_count(self, obj):
-        """Получаем количество сообщений в сессии"""
-        return obj.messages.count()
+        read_only_fields = ['id', 'created_at', 'updated_at', 'message_count']
         
     def create(self, validated_data):
         """Автоматически устанавливаем пользователя из запроса"""
@@ -42,29 +43,27 @@ class ChatSessionSerializer(serializers.ModelSerializer):
 
 
 class ChatSessionListSerializer(serializers.ModelSerializer):
-    """Облегченный сериализатор для списка сессий чата (без сообщений)"""
-    message_count = serializers.SerializerMethodField()
+    """
+    Облегченный сериализатор для списка сессий чата (без сообщений).
+    Счетчик и последнее сообщение берутся из денормализованных полей сессии,
+    поэтому список — один запрос независимо от числа сессий.
+    """
     last_message = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatSession
-        fields = ['id', 'title', 'created_at', 'updated_at', 'message_count', 'last_message']
-        read_only_fields = ['id', 'created_at', 'updated_at']
-        
-    def get_message_count(self, obj):
-        """Получаем количество сообщений в сессии"""
-        return obj.messages.count()
+        fields = ['id', 'title', 'created_at', 'updated_at', 'last_activity_at', 'message_count', 'last_message']
+        read_only_fields = fields
         
     def get_last_message(self, obj):
-        """Получаем последнее сообщение в сессии"""
-        last_msg = obj.messages.last()
-        if last_msg:
-            return {
-                'text': last_msg.text[:100] + '...' if len(last_msg.text) > 100 else last_msg.text,
-                'sender': last_msg.sender,
-                'created_at': last_msg.created_at
-            }
-        return None
+        """Последнее сообщение в сессии"""
+        if obj.last_message_at is None:
+            return None
+        return {
+            'text': obj.last_message_preview,
+            'sender': obj.last_message_sender,
+            'created_at': obj.last_message_at
+        }
 
 
 class CreateChatMessageSerializer(serializers.ModelSerializer):
@@ -90,10 +89,11 @@ class CreateChatMessageSerializer(serializers.ModelSerializer):
         ai_response = self._generate_ai_response(
             request.user, 
             session, 
-            validated_data['text']
+            user_message
         )
         
-        ChatMessage.objects.create(
+        # Ответ AI доступен вызывающему коду после save()
+        self.ai_message = ChatMessage.objects.create(
             session=session,
             text=ai_response,
             sender='ai'
@@ -101,7 +101,7 @@ class CreateChatMessageSerializer(serializers.ModelSerializer):
         
         return user_message
         
-    def _generate_ai_response(self, user, session, user_text):
+    def _generate_ai_response(self, user, session, user_message):
         """Генерация AI ответа с использованием настроек пользователя"""
         try:
             # Получаем профиль пользователя
@@ -109,29 +109,27 @@ class CreateChatMessageSerializer(serializers.ModelSerializer):
             if not user_profile:
                 return "❌ Не удалось найти настройки профиля пользователя."
             
-            # Получаем историю сообщений для контекста (последние 10)
-            conversation_history = []
-            for msg in session.messages.all().order_by('created_at')[-10:]:
-                conversation_history.append({
-                    'sender': msg.sender,
-                    'text': msg.text
-                })
+            # История для контекста в пределах бюджета токенов модели (без текущего сообщения)
+            conversation_history = build_context(session, user_profile.ai_model, exclude_id=user_message.id)
             
-            # Генерируем ответ асинхронно
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                ai_response = loop.run_until_complete(
-                    ai_service.generate_response(
-                        user_profile=user_profile,
-                        message=user_text,
-                        conversation_history=conversation_history
-                    )
+            # Генерируем ответ в общем фоновом цикле событий процесса
+            return run_sync(
+                ai_service.generate_response(
+                    user_profile=user_profile,
+                    message=user_message.text,
+                    conversation_history=conversation_history
                 )
-                return ai_response
-            finally:
-                loop.close()
+            )
                 
         except Exception as e:
             logger.error(f"Ошибка генерации AI ответа: {e}")
-            return f"❌ Произошла ошибка при генерации ответа: {str(e)}"
\ No newline at end of file
+            return f"❌ Произошла ошибка при генерации ответа: {str(e)}"
+
+
+class AIJobSerializer(serializers.ModelSerializer):
+    """Статус и результат фоновой AI задачи"""
+    
+    class Meta:
+        model = AIJob
+        fields = ['id', 'kind', 'status', 'result', 'error', 'attempts', 'run_after', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
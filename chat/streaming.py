@@ -0,0 +1,54 @@
+"""
+Server-Sent Events для потоковых ответов AI.
+
+Ответ провайдера читается асинхронным генератором `ai_service.stream_response`,
+а каждый фрагмент сразу уходит клиенту событием `delta`, поэтому первый
+текст появляется через время до первого токена, а не после всей генерации.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from backend.background_loop import run_sync
+
+
+def sse_event(event, data):
+    """Одно событие SSE с JSON в поле data"""
+    payload = json.dumps(data, cls=JSONEncoder, ensure_ascii=False)
+    return f'event: {event}\ndata: {payload}\n\n'.encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Позволяет клиенту запрашивать `Accept: text/event-stream`. Обычные ответы
+    (ошибки валидации, лимиты) отдаются одним событием `error`.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return sse_event('error', data)
+
+
+async def _next_chunk(async_iterator):
+    return await async_iterator.__anext__()
+
+
+def iterate_async(async_iterator):
+    """
+    Синхронный обход асинхронного генератора для WSGI: шаги выполняются
+    в общем фоновом цикле событий процесса. Если клиент отключился,
+    генератор закрывается вместе с открытым соединением к провайдеру.
+    """
+    try:
+        while True:
+            try:
+                yield run_sync(_next_chunk(async_iterator))
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(async_iterator.aclose())
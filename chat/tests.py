@@ -1,3 +1,343 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from tasks.tests import QueryPlanTestMixin
+from users import quota
+from . import jobs
+from .ai_service import AIService, AIServiceError, is_error_response
+from .context import build_context
+from .models import AIJob, ChatSession, ChatMessage
+from .views import ChatSessionViewSet
+
+
+class ChatMessageQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """Регрессионный бенчмарк: история сессии читается по индексу"""
+    SESSIONS = 200
+    MESSAGES_PER_SESSION = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='plan_chat_user')
+        sessions = ChatSession.objects.bulk_create(
+            ChatSession(user=user, title=f'Сессия {i}') for i in range(cls.SESSIONS)
+        )
+        ChatMessage.objects.bulk_create(
+            (
+                ChatMessage(session=session, text=f'Сообщение {i}', sender='user' if i % 2 else 'ai')
+                for session in sessions
+                for i in range(cls.MESSAGES_PER_SESSION)
+            ),
+            batch_size=1000,
+        )
+        cls.session = sessions[0]
+        cls.analyze()
+
+    def test_session_history(self):
+        self.assertUsesIndex(ChatMessage.objects.filter(session=self.session))
+
+    def test_latest_messages(self):
+        self.assertUsesIndex(
+            ChatMessage.objects.filter(session=self.session).order_by('-created_at', '-id')[:10]
+        )
+
+
+
+class BuildContextTests(TestCase):
+    """Контекст для AI: окно последних реплик и сводка всего, что старше"""
+
+    def setUp(self):
+        user = User.objects.create(username='context_user')
+        self.session = ChatSession.objects.create(user=user, title='Контекст')
+        self.total = settings.AI_CONTEXT_MAX_MESSAGES + 20
+        messages = ChatMessage.objects.bulk_create(
+            ChatMessage(session=self.session, text=f'Сообщение {i}', sender='user' if i % 2 else 'ai')
+            for i in range(self.total)
+        )
+        start = timezone.now() - datetime.timedelta(hours=1)
+        for i, message in enumerate(messages):
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=start + datetime.timedelta(seconds=i))
+        self.messages = list(self.session.messages.order_by('created_at'))
+
+    def test_messages_older_than_window_are_summarized(self):
+        history = build_context(self.session, 'chatgpt')
+
+        window = settings.AI_CONTEXT_MAX_MESSAGES
+        self.assertEqual(len(history), window + 1)
+        self.assertEqual(history[0]['sender'], 'summary')
+        summary_lines = history[0]['text'].splitlines()
+        self.assertEqual(len(summary_lines), self.total - window)
+        self.assertEqual(summary_lines[0], 'AI: Сообщение 0')
+        self.assertEqual(summary_lines[-1], f'Пользователь: Сообщение {self.total - window - 1}')
+        self.assertEqual(history[1]['text'], f'Сообщение {self.total - window}')
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.context_summary_until, self.messages[self.total - window - 1].created_at)
+
+    def test_summary_is_not_folded_twice(self):
+        first = build_context(self.session, 'chatgpt')
+        self.session.refresh_from_db()
+        self.assertEqual(build_context(self.session, 'chatgpt'), first)
+
+
+
+class StreamMessageASGITests(TestCase):
+    """Потоковый ответ под ASGI: фрагменты уходят до окончания генерации"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='stream_user')
+        self.token = Token.objects.create(user=self.user)
+        self.session = ChatSession.objects.create(user=self.user, title='Поток')
+
+    async def test_first_delta_arrives_before_provider_finishes(self):
+        provider_finished = []
+
+        async def stream_response(profile, message, history):
+            yield 'Привет'
+            await asyncio.sleep(0.5)
+            yield ', мир'
+            provider_finished.append(True)
+
+        request = AsyncRequestFactory().post(
+            f'/api/chat/sessions/{self.session.pk}/stream_message/',
+            json.dumps({'text': 'Здравствуй'}), content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        view = ChatSessionViewSet.as_view({'post': 'stream_message'})
+        with mock.patch('chat.views.ai_service.stream_response', stream_response):
+            response = await sync_to_async(view)(request, pk=self.session.pk)
+            self.assertEqual(response.status_code, 200)
+            events = aiter(response)
+
+            self.assertIn(b'event: user_message', await asyncio.wait_for(anext(events), 5))
+            first_delta = await asyncio.wait_for(anext(events), 5)
+            self.assertIn('Привет', first_delta.decode())
+            self.assertEqual(provider_finished, [])
+
+            rest = b''.join([chunk async for chunk in events])
+        self.assertEqual(provider_finished, [True])
+        self.assertIn(b'event: done', rest)
+        self.assertEqual(
+            await ChatMessage.objects.filter(session=self.session, sender='ai').values_list('text', flat=True).aget(),
+            'Привет, мир'
+        )
+
+
+class AIJobQueueTests(TestCase):
+    """Очередь AI задач: захват, аренда, повторы и возврат лимита"""
+
+    WORKER = 'worker-a'
+    OTHER = 'worker-b'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='jobs_user')
+        self.session = ChatSession.objects.create(user=self.user, title='Фон')
+
+    def enqueue_reply(self, text='Вопрос'):
+        return jobs.enqueue_chat_reply(self.session, text)['job']['id']
+
+    def expire_lease(self, job_id):
+        AIJob.objects.filter(pk=job_id).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_claim_takes_queued_jobs_once_in_order(self):
+        first, second, third = (jobs.enqueue(self.user.id, 'task_description', {'title': str(i)}) for i in range(3))
+
+        claimed = jobs.claim_jobs(self.WORKER, 2)
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        self.assertTrue(all(job.status == 'running' and job.attempts == 1 for job in claimed))
+        self.assertEqual([job.pk for job in jobs.claim_jobs(self.OTHER, 10)], [third.pk])
+        # Аренда действует: повторно задачи не выдаются
+        self.assertEqual(jobs.claim_jobs(self.OTHER, 10), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        job_id = self.enqueue_reply()
+        jobs.claim_jobs(self.WORKER, 1)
+        self.expire_lease(job_id)
+
+        [job] = jobs.claim_jobs(self.OTHER, 1)
+        self.assertEqual((str(job.pk), job.worker, job.attempts), (job_id, self.OTHER, 2))
+
+    @mock.patch('chat.ai_service.ai_service.generate_response', new_callable=mock.AsyncMock, return_value='Ответ')
+    async def test_reclaimed_job_is_not_written_twice(self, generate_response):
+        job_id = await sync_to_async(self.enqueue_reply)()
+        [stale] = await sync_to_async(jobs.claim_jobs)(self.WORKER, 1)
+        await sync_to_async(self.expire_lease)(job_id)
+        [fresh] = await sync_to_async(jobs.claim_jobs)(self.OTHER, 1)
+
+        await jobs.run_job(fresh, self.OTHER)
+        # Первый воркер дождался провайдера после истечения аренды
+        with self.assertLogs('chat.jobs', 'WARNING'):
+            await jobs.run_job(stale, self.WORKER)
+
+        self.assertEqual(await ChatMessage.objects.filter(session=self.session, sender='ai').acount(), 1)
+        job = await AIJob.objects.aget(pk=job_id)
+        self.assertEqual((job.status, job.worker), ('done', self.OTHER))
+        self.assertEqual(job.result['message']['text'], 'Ответ')
+
+    @override_settings(AI_JOBS_LEASE_SECONDS=1)
+    async def test_lease_is_renewed_while_provider_answers(self):
+        async def slow_response(**kwargs):
+            await asyncio.sleep(0.6)
+            return 'Ответ'
+
+        job_id = await sync_to_async(self.enqueue_reply)()
+        [job] = await sync_to_async(jobs.claim_jobs)(self.WORKER, 1)
+        with mock.patch('chat.ai_service.ai_service.generate_response', slow_response):
+            running = asyncio.create_task(jobs.run_job(job, self.WORKER))
+            await asyncio.sleep(0.45)
+            locked_until = (await AIJob.objects.aget(pk=job_id)).locked_until
+            await running
+        self.assertGreater(locked_until, job.locked_until)
+        self.assertEqual((await AIJob.objects.aget(pk=job_id)).status, 'done')
+
+    @override_settings(AI_JOBS_RETRY_DELAY=10, AI_JOBS_MAX_ATTEMPTS=3)
+    @mock.patch('chat.ai_service.ai_service.generate_response', new_callable=mock.AsyncMock, side_effect=RuntimeError('timeout'))
+    async def test_failed_job_is_retried_after_backoff(self, generate_response):
+        job_id = await sync_to_async(self.enqueue_reply)()
+        [job] = await sync_to_async(jobs.claim_jobs)(self.WORKER, 1)
+        before = timezone.now()
+        with self.assertLogs('chat.jobs', 'ERROR'):
+            await jobs.run_job(job, self.WORKER)
+
+        job = await AIJob.objects.aget(pk=job_id)
+        self.assertEqual((job.status, job.error, job.attempts), ('queued', 'timeout', 1))
+        self.assertGreaterEqual(job.run_after, before + datetime.timedelta(seconds=10))
+        # До истечения паузы задача не выдается
+        self.assertEqual(await sync_to_async(jobs.claim_jobs)(self.OTHER, 1), [])
+
+        later = job.run_after + datetime.timedelta(seconds=1)
+        with mock.patch('chat.jobs.timezone.now', return_value=later):
+            [job] = await sync_to_async(jobs.claim_jobs)(self.OTHER, 1)
+            with self.assertLogs('chat.jobs', 'ERROR'):
+                await jobs.run_job(job, self.OTHER)
+        job = await AIJob.objects.aget(pk=job_id)
+        self.assertEqual((job.status, job.attempts), ('queued', 2))
+        # Пауза удваивается с каждой попыткой
+        self.assertEqual(job.run_after, later + datetime.timedelta(seconds=20))
+
+    @override_settings(AI_JOBS_MAX_ATTEMPTS=2)
+    @mock.patch('chat.ai_service.ai_service.generate_response', new_callable=mock.AsyncMock, side_effect=RuntimeError('timeout'))
+    async def test_last_attempt_fails_job_and_refunds_quota(self, generate_response):
+        profile = await sync_to_async(lambda: self.user.profile)()
+        self.assertTrue(await sync_to_async(quota.reserve)(profile, quota.CHAT_REQUESTS))
+        job_id = await sync_to_async(self.enqueue_reply)()
+        await AIJob.objects.filter(pk=job_id).aupdate(attempts=1)
+
+        [job] = await sync_to_async(jobs.claim_jobs)(self.WORKER, 1)
+        with self.assertLogs('chat.jobs', 'ERROR'):
+            await jobs.run_job(job, self.WORKER)
+
+        job = await AIJob.objects.aget(pk=job_id)
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 2, 'timeout'))
+        self.assertIsNotNone(job.finished_at)
+        await profile.arefresh_from_db()
+        self.assertEqual(profile.ai_chat_requests_used, 0)
+        self.assertEqual(await ChatMessage.objects.filter(session=self.session, sender='ai').acount(), 0)
+
+
+class GenerateResponseSingleFlightTests(SimpleTestCase):
+    """Одинаковые одновременные запросы к AI разделяют один запрос к провайдеру"""
+
+    def setUp(self):
+        self.service = AIService()
+        self.profile = SimpleNamespace(ai_model='chatgpt', ai_personality='')
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def provider(self, user_profile, message, personality, history):
+        self.calls += 1
+        await asyncio.wait_for(self.release.wait(), 5)
+        if message == 'сломай':
+            raise RuntimeError('провайдер недоступен')
+        return f'Ответ: {message}'
+
+    def start(self, count, message='Привет'):
+        return [
+            asyncio.create_task(self.service.generate_response(self.profile, message, [{'role': 'user', 'content': 'ранее'}]))
+            for _ in range(count)
+        ]
+
+    def in_flight(self):
+        return self.service._in_flight.get(asyncio.get_running_loop(), {})
+
+    async def test_concurrent_identical_calls_share_one_provider_call(self):
+        with mock.patch.object(self.service, '_generate_openai_response', self.provider):
+            waiters = self.start(5)
+            await asyncio.sleep(0)
+            self.assertEqual(len(self.in_flight()), 1)
+            self.release.set()
+            results = await asyncio.gather(*waiters)
+        self.assertEqual(results, ['Ответ: Привет'] * 5)
+        self.assertEqual(self.calls, 1)
+        # Завершенный запрос не остается в таблице: следующий вызов идет к провайдеру
+        self.assertEqual(self.in_flight(), {})
+
+    async def test_different_requests_are_not_merged(self):
+        with mock.patch.object(self.service, '_generate_openai_response', self.provider):
+            waiters = self.start(2, 'Первый') + self.start(2, 'Второй')
+            self.release.set()
+            results = await asyncio.gather(*waiters)
+        self.assertEqual(results, ['Ответ: Первый'] * 2 + ['Ответ: Второй'] * 2)
+        self.assertEqual(self.calls, 2)
+
+    async def test_error_is_shared_by_all_waiters(self):
+        with mock.patch.object(self.service, '_generate_openai_response', self.provider), \
+                self.assertLogs('chat.ai_service', 'ERROR'):
+            waiters = self.start(3, 'сломай')
+            self.release.set()
+            results = await asyncio.gather(*waiters)
+        self.assertEqual(len(set(results)), 1)
+        self.assertTrue(is_error_response(results[0]))
+        self.assertIn('провайдер недоступен', results[0])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.in_flight(), {})
+
+    async def test_unexpected_exception_reaches_all_waiters(self):
+        failing = mock.AsyncMock(side_effect=AIServiceError('сбой'))
+        with mock.patch.object(self.service, '_generate_response', failing):
+            results = await asyncio.gather(*self.start(3), return_exceptions=True)
+        self.assertEqual(failing.await_count, 1)
+        self.assertTrue(all(isinstance(result, AIServiceError) for result in results))
+        self.assertEqual(self.in_flight(), {})
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        with mock.patch.object(self.service, '_generate_openai_response', self.provider):
+            cancelled, *others = self.start(3)
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            self.assertTrue(cancelled.cancelled())
+            [entry] = self.in_flight().values()
+            self.assertFalse(entry['task'].cancelled())
+
+            self.release.set()
+            results = await asyncio.gather(*others)
+        self.assertEqual(results, ['Ответ: Привет'] * 2)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.in_flight(), {})
+
+    async def test_request_is_cancelled_when_last_waiter_leaves(self):
+        with mock.patch.object(self.service, '_generate_openai_response', self.provider):
+            waiters = self.start(2)
+            await asyncio.sleep(0)
+            [entry] = self.in_flight().values()
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            # Результат никому не нужен: запрос к провайдеру отменяется
+            with self.assertRaises(asyncio.CancelledError):
+                await entry['task']
+        self.assertEqual(self.in_flight(), {})
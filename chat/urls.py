@@ -1,8 +1,19 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import ChatSessionViewSet, ChatMessageViewSet
+from .views import ChatSessionViewSet, ChatMessageViewSet, AIJobViewSet
 
 router = DefaultRouter()
 router.register(r'sessions', ChatSessionViewSet, basename='chat-session')
 router.register(r'messages', ChatMessageViewSet, basename='chat-message')
+router.register(r'jobs', AIJobViewSet, basename='ai-job')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+if settings.ASYNC_AI_VIEWS:
+    from . import async_views
+
+    # Маршрут раньше роутера: под ASGI отправка сообщения не занимает поток
+    urlpatterns = [
+        path('sessions/<uuid:pk>/send_message/', async_views.send_message),
+    ] + urlpatterns
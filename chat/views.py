@@ -2,13 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
-from .models import ChatSession, ChatMessage
+from backend.conditional import conditional_list
+from users import quota
+from . import jobs
+from .models import AIJob, ChatSession, ChatMessage, refresh_session_summary
+from .ai_service import ai_service, is_error_response
+from .context import build_context
+from .pagination import MessageCursorPagination
 from .serializers import (
     ChatSessionSerializer, ChatSessionListSerializer, 
-    ChatMessageSerializer, CreateChatMessageSerializer
+    ChatMessageSerializer, CreateChatMessageSerializer, message_values_serializer,
+    AIJobSerializer
 )
+from .streaming import EventStreamRenderer, iterate_async, sse_event
 
 
 class ChatSessionViewSet(viewsets.ModelViewSet):
@@ -19,23 +32,57 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
         """Возвращаем разные сериализаторы для разных действий"""
         if self.action == 'list':
             return ChatSessionListSerializer
+        if self.action == 'retrieve' and self.request.query_params.get('embed_messages') in ('0', 'false'):
+            # Сессия без истории: сводка из полей сессии, стоимость не зависит от длины чата
+            return ChatSessionListSerializer
         return ChatSessionSerializer
     
     def get_queryset(self):
         """Возвращаем только сессии текущего пользователя"""
-        return ChatSession.objects.filter(user=self.request.user)
+        queryset = ChatSession.objects.filter(user=self.request.user)
+        if self.action == 'list' and self.request.query_params.get('ordering') == 'activity':
+            # Недавно активные сессии первыми (индекс user, -last_activity_at)
+            queryset = queryset.order_by('-last_activity_at', '-id')
+        return queryset
+    
+    def get_collection_version(self):
+        """Версия для ETag: запись сообщения обновляет updated_at своей сессии"""
+        if self.action == 'messages':
+            return self.get_object().updated_at
+        return self.get_queryset().aggregate(
+            last_updated=Max('updated_at'), count=Count('id')
+        )
+    
+    @conditional_list
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @conditional_list
     def messages(self, request, pk=None):
-        """Получить все сообщения сессии"""
+        """
+        Получить сообщения сессии.
+        
+        С параметрами cursor/page_size — постранично от последних сообщений к
+        более старым (каждая страница в хронологическом порядке), иначе вся история.
+        """
         session = self.get_object()
-        messages = session.messages.all()
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = message_values_serializer.values(session.messages.all())
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(message_values_serializer.serialize(page))
+        return Response(message_values_serializer.serialize(messages))
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
-        """Отправить сообщение в сессию (с автоматическим AI ответом)"""
+        """
+        Отправить сообщение в сессию (с автоматическим AI ответом).
+        
+        Возвращает только новые сообщения и курсор к предшествующей истории
+        (messages/?cursor=...); с ?full=1 — все сообщения сессии, как раньше.
+        С ?background=1 ответ AI ставится в очередь, а клиент сразу получает 202 с задачей.
+        """
         session = self.get_object()
         serializer = CreateChatMessageSerializer(
             data=request.data,
@@ -43,34 +90,123 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
         )
         
         if serializer.is_valid():
-            # Проверяем лимиты AI запросов
-            try:
-                profile = request.user.profile
-                if profile.ai_chat_requests_used >= profile.ai_chat_requests_limit:
-                    return Response(
-                        {'error': f'Превышен лимит AI чат-запросов: {profile.ai_chat_requests_limit}'},
-                        status=status.HTTP_429_TOO_MANY_REQUESTS
-                    )
-                
-                # Увеличиваем счетчик
-                profile.ai_chat_requests_used += 1
-                profile.save()
-                
-            except Exception:
-                # Если профиля нет, создаем его
-                from users.models import UserProfile
-                profile = UserProfile.objects.create(user=request.user)
-                profile.ai_chat_requests_used = 1
-                profile.save()
+            limit_response = self._use_chat_request(request)
+            if limit_response is not None:
+                return limit_response
+            
+            if jobs.wants_background(request):
+                # Ответ AI сформирует воркер; клиент опрашивает jobs/{id}/
+                data = jobs.enqueue_chat_reply(session, serializer.validated_data['text'])
+                return Response(data, status=status.HTTP_202_ACCEPTED)
             
             user_message = serializer.save()
+            if is_error_response(serializer.ai_message.text):
+                # Провайдер не ответил — запрос не учитываем
+                quota.refund(request.user.profile, quota.CHAT_REQUESTS)
             
-            # Возвращаем все сообщения сессии после добавления
-            messages = session.messages.all()
-            message_serializer = ChatMessageSerializer(messages, many=True)
-            return Response(message_serializer.data, status=status.HTTP_201_CREATED)
+            if wants_full_history(request):
+                messages = message_values_serializer.values(session.messages.all())
+                return Response(message_values_serializer.serialize(messages), status=status.HTTP_201_CREATED)
+            return Response(
+                sent_messages_data(user_message, serializer.ai_message),
+                status=status.HTTP_201_CREATED
+            )
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['post'], renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def stream_message(self, request, pk=None):
+        """
+        Отправить сообщение и получить ответ AI потоком (Server-Sent Events).
+        
+        События: user_message — сохраненное сообщение пользователя, delta —
+        очередной фрагмент ответа ({"text": ...}), done — сохраненное
+        сообщение AI. Ошибки до начала потока отдаются событием error.
+        """
+        session = self.get_object()
+        serializer = CreateChatMessageSerializer(
+            data=request.data,
+            context={'session': session, 'request': request}
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        limit_response = self._use_chat_request(request)
+        if limit_response is not None:
+            return limit_response
+        
+        user_message = ChatMessage.objects.create(
+            session=session,
+            text=serializer.validated_data['text'],
+            sender='user'
+        )
+        history = build_context(session, request.user.profile.ai_model, exclude_id=user_message.id)
+        # Под ASGI Django буферизует синхронный итератор целиком (sync_to_async(list)),
+        # поэтому там отдаем асинхронный генератор, а под WSGI — синхронный
+        if isinstance(request._request, ASGIRequest):
+            events = self._astream_events(session, request.user.profile, user_message, history)
+        else:
+            events = self._stream_events(session, request.user.profile, user_message, history)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Без буферизации ответа на nginx, иначе фрагменты придут одним блоком
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def _stream_events(self, session, profile, user_message, history):
+        yield sse_event('user_message', ChatMessageSerializer(user_message).data)
+        
+        chunks = []
+        ai_message = None
+        try:
+            for chunk in iterate_async(ai_service.stream_response(profile, user_message.text, history)):
+                chunks.append(chunk)
+                yield sse_event('delta', {'text': chunk})
+        finally:
+            ai_message = self._save_streamed_reply(session, profile, chunks)
+        
+        yield sse_event('done', ChatMessageSerializer(ai_message).data if ai_message else None)
+    
+    async def _astream_events(self, session, profile, user_message, history):
+        """То же, что _stream_events, для ASGI: фрагменты уходят клиенту из цикла событий сервера"""
+        yield sse_event('user_message', ChatMessageSerializer(user_message).data)
+        
+        chunks = []
+        ai_message = None
+        try:
+            async for chunk in ai_service.stream_response(profile, user_message.text, history):
+                chunks.append(chunk)
+                yield sse_event('delta', {'text': chunk})
+        finally:
+            ai_message = await sync_to_async(self._save_streamed_reply)(session, profile, chunks)
+        
+        yield sse_event('done', ChatMessageSerializer(ai_message).data if ai_message else None)
+    
+    @staticmethod
+    def _save_streamed_reply(session, profile, chunks):
+        """Сохранить полученный ответ (и при обрыве соединения); без ответа — вернуть лимит"""
+        ai_message = None
+        if chunks:
+            ai_message = ChatMessage.objects.create(session=session, text=''.join(chunks), sender='ai')
+        if not chunks or is_error_response(chunks[0]):
+            quota.refund(profile, quota.CHAT_REQUESTS)
+        return ai_message
+    
+    def _use_chat_request(self, request):
+        """Проверка и учет лимита AI чат-запросов; при превышении — ответ 429"""
+        profile, allowed = use_chat_request(request.user)
+        if not allowed:
+            return Response(chat_limit_error(profile), status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return None
+
+
+class AIJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Статус фоновых AI задач пользователя (для опроса клиентом)"""
+    serializer_class = AIJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return AIJob.objects.filter(user=self.request.user).order_by('-created_at')
 
 
 class ChatMessageViewSet(viewsets.ModelViewSet):
@@ -82,6 +218,22 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         """Возвращаем только сообщения из сессий текущего пользователя"""
         return ChatMessage.objects.filter(session__user=self.request.user)
     
+    def get_collection_version(self):
+        """Версия для ETag: запись сообщения обновляет updated_at своей сессии"""
+        return ChatSession.objects.filter(user=self.request.user).aggregate(
+            last_updated=Max('updated_at'), count=Count('id')
+        )
+    
+    @conditional_list
+    def list(self, request, *args, **kwargs):
+        messages = message_values_serializer.values(self.filter_queryset(self.get_queryset()))
+        return Response(message_values_serializer.serialize(messages))
+    
+    def perform_destroy(self, instance):
+        """Удаление сообщения меняет сводку и версию сессии"""
+        instance.delete()
+        refresh_session_summary(instance.session_id)
+    
     def create(self, request, *args, **kwargs):
         """Переопределяем создание для установки сессии"""
         session_id = request.data.get('session_id')
@@ -101,3 +253,27 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def wants_full_history(request):
+    """Клиент ждет от send_message все сообщения сессии (?full=1), а не только новые"""
+    return request.GET.get('full') in ('1', 'true')
+
+
+def sent_messages_data(user_message, ai_message):
+    """Ответ send_message: новые сообщения и курсор к более ранней истории"""
+    return {
+        'messages': ChatMessageSerializer([user_message, ai_message], many=True).data,
+        'cursor': MessageCursorPagination().cursor_before(user_message),
+    }
+
+
+def chat_limit_error(profile):
+    return {'error': f'Превышен лимит AI чат-запросов: {profile.ai_chat_requests_limit}'}
+
+
+def use_chat_request(user):
+    """Списать AI чат-запрос пользователя. Возвращает (профиль, False), если лимит исчерпан"""
+    profile = quota.profile_for(user)
+    return profile, quota.reserve(profile, quota.CHAT_REQUESTS)
+
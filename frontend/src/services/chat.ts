@@ -4,7 +4,8 @@ import type {
   APIChatSessionList,
   APIChatMessage,
   CreateChatSessionRequest,
-  SendChatMessageRequest
+  SendChatMessageRequest,
+  SendChatMessageResponse
 } from '../types/api';
 
 // API service для работы с чат-сессиями и сообщениями
@@ -44,8 +45,8 @@ export const chatAPI = {
   },
 
   // Отправка сообщения в сессию (с автоматической генерацией AI ответа)
-  async sendMessage(sessionId: string, data: SendChatMessageRequest): Promise<APIChatMessage[]> {
-    return apiClient.post<APIChatMessage[]>(`/chat/sessions/${sessionId}/send_message/`, data);
+  async sendMessage(sessionId: string, data: SendChatMessageRequest): Promise<SendChatMessageResponse> {
+    return apiClient.post<SendChatMessageResponse>(`/chat/sessions/${sessionId}/send_message/`, data);
   },
 
   // Создание сообщения напрямую (без AI ответа)
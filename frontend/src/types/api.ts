@@ -110,6 +110,12 @@ export interface SendChatMessageRequest {
   text: string;
 }
 
+// Ответ send_message: новые сообщения и курсор к более ранней истории
+export interface SendChatMessageResponse {
+  messages: APIChatMessage[];
+  cursor: string;
+}
+
 // Типы для AI usage
 export interface AIUsageResponse {
   ai_descriptions_used: number;
@@ -1,6 +1,7 @@
-import asyncio
 import logging
-from chat.ai_service import ai_service, AIServiceError
+from backend.background_loop import run_sync
+from chat.ai_service import ai_service, AIServiceError, is_error_response
+from . import description_cache
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +10,23 @@ class TaskAIService:
     """Сервис для генерации описаний задач с помощью AI"""
     
     def generate_task_description(self, user_profile, task_title: str, language: str = "ru") -> str:
+        """Синхронная генерация описания (в общем фоновом цикле событий процесса)"""
+        # Попадание в кэш отдаем сразу, без перехода в фоновый цикл
+        if task_title.strip():
+            cached = description_cache.get_description(task_title, language, user_profile.ai_model)
+            if cached is not None:
+                return cached
+        return run_sync(self._generate_task_description(user_profile, task_title, language))
+    
+    async def agenerate_task_description(self, user_profile, task_title: str, language: str = "ru") -> str:
+        """Генерация описания задачи; популярные заголовки отдаются из общего кэша"""
+        if task_title.strip():
+            cached = await description_cache.aget_description(task_title, language, user_profile.ai_model)
+            if cached is not None:
+                return cached
+        return await self._generate_task_description(user_profile, task_title, language)
+    
+    async def _generate_task_description(self, user_profile, task_title: str, language: str = "ru") -> str:
         """
         Генерация описания задачи на основе заголовка
         
@@ -63,25 +81,24 @@ class TaskAIService:
             user_profile.ai_personality = system_prompt
             
             # Генерируем ответ
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             try:
-                description = loop.run_until_complete(
-                    ai_service.generate_response(
-                        user_profile=user_profile,
-                        message=user_prompt,
-                        conversation_history=[]
-                    )
+                description = await ai_service.generate_response(
+                    user_profile=user_profile,
+                    message=user_prompt,
+                    conversation_history=[]
                 )
+                description = description.strip()
+                # Сообщения об ошибках провайдера не кэшируем
+                if description and not is_error_response(description):
+                    await description_cache.aset_description(
+                        task_title, language, user_profile.ai_model, description
+                    )
+                return description
                 
+            finally:
                 # Восстанавливаем оригинальную персонализацию
                 user_profile.ai_personality = original_personality
                 
-                return description.strip()
-                
-            finally:
-                loop.close()
-                
         except AIServiceError as e:
             logger.error(f"AI service error for task description: {e}")
             return str(e)
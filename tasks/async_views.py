@@ -0,0 +1,75 @@
+"""
+Асинхронная версия генерации описания задачи (см. chat.async_views):
+подключается вместо действия ViewSet при ASYNC_AI_VIEWS.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+
+from backend.async_views import async_api_view, json_response
+from chat import jobs
+from chat.ai_service import is_error_response
+from users import quota
+from users.models import UserProfile
+from .ai_task_service import task_ai_service
+
+
+@async_api_view(['POST'])
+async def generate_description(request):
+    """Генерация описания задачи с помощью AI"""
+    if not isinstance(request.data, dict):
+        return json_response(
+            {'error': 'Тело запроса должно быть JSON объектом'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    title = request.data.get('title')
+    title = title.strip() if isinstance(title, str) else ''
+    language = request.data.get('language', 'ru')
+    
+    if not title:
+        return json_response(
+            {'error': 'Заголовок задачи обязателен для генерации описания'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        # Проверяем и списываем лимит AI использования
+        profile = await UserProfile.objects.filter(user=request.user).afirst()
+        if not profile:
+            return json_response(
+                {'error': 'Профиль пользователя не найден'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not await sync_to_async(quota.reserve)(profile, quota.DESCRIPTIONS):
+            return json_response(
+                {'error': f'Превышен лимит AI описаний: {profile.ai_descriptions_limit}'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        
+        if jobs.wants_background(request):
+            data = await sync_to_async(jobs.enqueue_task_description)(request.user.id, title, language)
+            return json_response(data, status=status.HTTP_202_ACCEPTED)
+        
+        # Генерируем описание, не блокируя поток на время ответа модели
+        try:
+            description = await task_ai_service.agenerate_task_description(
+                user_profile=profile,
+                task_title=title,
+                language=language
+            )
+        except Exception:
+            await sync_to_async(quota.refund)(profile, quota.DESCRIPTIONS)
+            raise
+        if is_error_response(description):
+            await sync_to_async(quota.refund)(profile, quota.DESCRIPTIONS)
+        
+        return json_response({
+            'description': description,
+            'remaining_uses': profile.ai_descriptions_limit - profile.ai_descriptions_used
+        })
+        
+    except Exception as e:
+        return json_response(
+            {'error': f'Ошибка генерации описания: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,77 @@
+"""
+Кэш AI описаний задач, общий для всех пользователей.
+
+Описание зависит только от заголовка, языка и модели (системный промпт
+фиксирован), поэтому популярные заголовки («купить продукты»,
+«приготовить борщ») отдаются из кэша без обращения к провайдеру.
+Хранится в алиасе кэша 'ai' (TTL и размер — в настройках CACHES).
+"""
+import hashlib
+
+from django.core.cache import caches
+
+HITS_KEY = 'ai:descriptions:hits'
+MISSES_KEY = 'ai:descriptions:misses'
+
+
+def normalize_title(title):
+    """Заголовок без различий в регистре, пробелах и конечной пунктуации"""
+    return ' '.join(title.casefold().split()).rstrip('.!?…')
+
+
+def _cache_key(title, language, model):
+    digest = hashlib.sha256(f'{model}:{language}:{normalize_title(title)}'.encode()).hexdigest()
+    return f'ai:description:{digest}'
+
+
+def _count(cache, key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счетчик вытеснен между add и incr
+        cache.add(key, 1, None)
+
+
+async def _acount(cache, key):
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, None)
+
+
+def get_description(title, language, model):
+    """Описание из кэша или None; учитывает попадания и промахи"""
+    cache = caches['ai']
+    description = cache.get(_cache_key(title, language, model))
+    _count(cache, MISSES_KEY if description is None else HITS_KEY)
+    return description
+
+
+def set_description(title, language, model, description):
+    caches['ai'].set(_cache_key(title, language, model), description)
+
+
+async def aget_description(title, language, model):
+    cache = caches['ai']
+    description = await cache.aget(_cache_key(title, language, model))
+    await _acount(cache, MISSES_KEY if description is None else HITS_KEY)
+    return description
+
+
+async def aset_description(title, language, model, description):
+    await caches['ai'].aset(_cache_key(title, language, model), description)
+
+
+def stats():
+    """Счетчики попаданий и промахов (в пределах процесса для локального кэша)"""
+    cache = caches['ai']
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def reset_stats():
+    caches['ai'].delete_many([HITS_KEY, MISSES_KEY])
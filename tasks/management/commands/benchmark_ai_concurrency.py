@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory
+from rest_framework.authtoken.models import Token
+
+from chat.ai_service import ai_service
+from tasks import async_views, description_cache
+from tasks.views import TaskViewSet
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Сколько одновременных запросов к AI держит один процесс: асинхронная view '
+        'генерации описания против синхронного действия ViewSet в пуле потоков '
+        '(как gunicorn --threads). Ответ провайдера имитируется задержкой; '
+        'тестовый пользователь удаляется после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Количество одновременных запросов')
+        parser.add_argument('--latency', type=float, default=0.5, help='Задержка ответа провайдера, секунды')
+        parser.add_argument('--threads', type=int, default=4, help='Потоков синхронного воркера')
+
+    def handle(self, *args, **options):
+        self.latency = options['latency']
+        self.in_flight = 0
+        self.peak = 0
+
+        user = User.objects.create(username=f'benchmark_{time.time_ns()}')
+        self.token = Token.objects.create(user=user).key
+        try:
+            # Общий кэш описаний отключаем: иначе второй замер целиком отвечал бы из кэша,
+            # заполненного первым, а рабочий кэш засорялся бы заголовками замера
+            with mock.patch.object(ai_service, 'generate_response', self._fake_generate_response), \
+                    mock.patch.dict(UserProfile.AI_DESCRIPTIONS_LIMITS, {'free': 10 ** 9}), \
+                    mock.patch.multiple(description_cache, **self._no_description_cache()):
+                self._report('async', options['requests'], lambda: asyncio.run(self._run_async(options['requests'])))
+                self._report('sync', options['requests'], lambda: self._run_sync(options['requests'], options['threads']))
+        finally:
+            user.delete()
+
+    @staticmethod
+    def _no_description_cache():
+        async def amiss(*args):
+            return None
+
+        async def astore(*args):
+            pass
+
+        return {
+            'get_description': lambda *args: None,
+            'set_description': lambda *args: None,
+            'aget_description': amiss,
+            'aset_description': astore,
+        }
+
+    async def _fake_generate_response(self, user_profile, message, conversation_history=None):
+        # Счетчики меняются только внутри одного цикла событий, блокировка не нужна
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return 'Описание задачи'
+        finally:
+            self.in_flight -= 1
+
+    def _request_kwargs(self):
+        return {
+            'data': json.dumps({'title': 'Подготовить отчет'}),
+            'content_type': 'application/json',
+            'headers': {'Authorization': f'Token {self.token}'},
+        }
+
+    async def _run_async(self, count):
+        factory = AsyncRequestFactory()
+
+        async def one():
+            request = factory.post('/api/tasks/tasks/generate_description/', **self._request_kwargs())
+            return await async_views.generate_description(request)
+
+        return await asyncio.gather(*(one() for _ in range(count)))
+
+    def _run_sync(self, count, threads):
+        factory = RequestFactory()
+        view = TaskViewSet.as_view({'post': 'generate_description'})
+
+        def one(_):
+            try:
+                request = factory.post('/api/tasks/tasks/generate_description/', **self._request_kwargs())
+                return view(request)
+            finally:
+                # Как по окончании запроса при CONN_MAX_AGE = 0
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(one, range(count)))
+
+    def _report(self, label, count, run):
+        self.peak = 0
+        started = time.perf_counter()
+        responses = run()
+        elapsed = time.perf_counter() - started
+
+        failed = [response.status_code for response in responses if response.status_code != 200]
+        if failed:
+            raise CommandError(f'{label}: {len(failed)} запросов завершились с ошибкой ({failed[0]})')
+        self.stdout.write(
+            f'{label:>5}: {count} запросов за {elapsed:6.2f} с, {count / elapsed:7.1f} запросов/с, '
+            f'одновременно ожидали ответа провайдера: {self.peak}'
+        )
@@ -0,0 +1,103 @@
+import datetime
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from chat.models import ChatSession, ChatMessage
+from chat.serializers import ChatMessageSerializer, message_values_serializer
+from tasks.models import Task
+from tasks.serializers import TaskSerializer, task_values_serializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ModelSerializer и быстрый путь через .values() на списках задач '
+        'и сообщений. Тестовые данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3, help='Лучший результат из N запусков')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username=f'benchmark_{time.time_ns()}')
+                session = ChatSession.objects.create(user=user, title='benchmark')
+                for size in sorted(options['sizes']):
+                    self._seed(user, session, size)
+                    self._compare(
+                        'tasks', size, options['repeat'],
+                        Task.objects.filter(user=user), TaskSerializer, task_values_serializer,
+                    )
+                    self._compare(
+                        'messages', size, options['repeat'],
+                        ChatMessage.objects.filter(session=session), ChatMessageSerializer,
+                        message_values_serializer,
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, user, session, size):
+        """Дозаполняем таблицы до нужного числа строк"""
+        existing = Task.objects.filter(user=user).count()
+        start = datetime.date(2024, 1, 1)
+        Task.objects.bulk_create(
+            (
+                Task(
+                    user=user,
+                    title=f'Задача {i}',
+                    description='Описание задачи для замера сериализации',
+                    date=start + datetime.timedelta(days=i % 365),
+                    time=datetime.time(i % 24, i % 60),
+                    completed=i % 3 == 0,
+                )
+                for i in range(existing, size)
+            ),
+            batch_size=2000,
+        )
+        ChatMessage.objects.bulk_create(
+            (
+                ChatMessage(session=session, text=f'Сообщение {i}', sender='user' if i % 2 else 'ai')
+                for i in range(existing, size)
+            ),
+            batch_size=2000,
+        )
+
+    def _compare(self, label, size, repeat, queryset, serializer_class, values_serializer):
+        renderer = JSONRenderer()
+
+        def model_path():
+            return renderer.render(serializer_class(queryset, many=True).data)
+
+        def values_path():
+            return renderer.render(values_serializer.serialize(values_serializer.values(queryset)))
+
+        model_time, model_json = self._measure(model_path, repeat)
+        values_time, values_json = self._measure(values_path, repeat)
+        if model_json != values_json:
+            raise CommandError(f'{label}: JSON быстрого пути отличается от ModelSerializer ({size} строк)')
+
+        self.stdout.write(
+            f'{label:>8} {size:>7} строк: ModelSerializer {model_time * 1000:9.1f} мс, '
+            f'values() {values_time * 1000:9.1f} мс, ускорение x{model_time / values_time:.1f}'
+        )
+
+    @staticmethod
+    def _measure(func, repeat):
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
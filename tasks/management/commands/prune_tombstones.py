@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет отметки об удалении старше срока хранения дельта-синхронизации'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.TASKS_SYNC_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено отметок: {deleted}'))
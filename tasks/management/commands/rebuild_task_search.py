@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tasks import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Переиндексирует задачи для полнотекстового поиска '
+        '(например, после восстановления SQLite базы из резервной копии)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID пользователя (по умолчанию все задачи)')
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index(user_id=options['user'])
+        self.stdout.write(self.style.SUCCESS(f'Переиндексировано задач: {count}'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:13
+
+from django.db import migrations, models
+
+from backend.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0002_task_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='custompriority',
+            index=models.Index(fields=['user', 'updated_at'], name='priority_user_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+        ),
+    ]
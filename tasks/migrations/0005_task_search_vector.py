@@ -0,0 +1,101 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:19
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION tasks_task_search_vector_update() RETURNS trigger AS $$
+DECLARE
+    cfg regconfig;
+BEGIN
+    SELECT CASE p.language WHEN 'en' THEN 'english' ELSE 'russian' END::regconfig
+      INTO cfg
+      FROM users_userprofile p
+     WHERE p.user_id = NEW.user_id;
+    IF cfg IS NULL THEN
+        cfg := 'russian';
+    END IF;
+    NEW.search_vector :=
+        setweight(to_tsvector(cfg, coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector(cfg, coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_task_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, user_id ON tasks_task
+    FOR EACH ROW EXECUTE FUNCTION tasks_task_search_vector_update();
+"""
+
+POSTGRES_DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS tasks_task_search_vector_trigger ON tasks_task;
+DROP FUNCTION IF EXISTS tasks_task_search_vector_update();
+"""
+
+SQLITE_FTS_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_task_fts USING fts5("
+    "task_id UNINDEXED, user_id UNINDEXED, title, description, "
+    "tokenize = 'porter unicode61 remove_diacritics 2')"
+)
+
+
+def create_search_backend(apps, schema_editor):
+    """Триггер tsvector на PostgreSQL или теневая таблица FTS5 на SQLite"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_TRIGGER_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_FTS_SQL)
+        Task = apps.get_model('tasks', 'Task')
+        rows = [
+            (task_id.int >> 65, task_id.hex, user_id, title, description)
+            for task_id, user_id, title, description
+            in Task.objects.values_list('id', 'user_id', 'title', 'description').iterator()
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO tasks_task_fts (rowid, task_id, user_id, title, description) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                rows
+            )
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """
+    Заполнить search_vector существующих задач пачками по id: каждая пачка —
+    отдельная короткая транзакция, а не UPDATE всей таблицы с блокировкой строк
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from tasks.search import touch_in_batches
+
+    touch_in_batches(apps.get_model('tasks', 'Task').objects.all())
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_DROP_TRIGGER_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS tasks_task_fts')
+
+
+class Migration(migrations.Migration):
+
+    # Заполнение векторов идет пачками вне общей транзакции миграции
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0004_tombstone'),
+        ('users', '0003_remove_userprofile_anthropic_api_key_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend, atomic=True),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:19
+
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    # Индекс создается только на PostgreSQL и не объявлен в Meta.indexes:
+    # иначе SQLite пытался бы создать GIN при пересборке таблицы
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS task_search_vector_idx '
+            'ON tasks_task USING gin (search_vector)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS task_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0005_task_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
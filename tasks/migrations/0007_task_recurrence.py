@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRecurrence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('frequency', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно'), ('monthly', 'Ежемесячно')], max_length=8, verbose_name='Частота')),
+                ('interval', models.PositiveSmallIntegerField(default=1, verbose_name='Интервал')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='Повторять до')),
+                ('excluded_dates', models.JSONField(blank=True, default=list, verbose_name='Исключенные даты')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Правило повторения',
+                'verbose_name_plural': 'Правила повторения',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='occurrence_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Дата повторения'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_parent',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='tasks.task', verbose_name='Повторяющаяся задача'),
+        ),
+        migrations.AddField(
+            model_name='taskrecurrence',
+            name='task',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='tasks.task', verbose_name='Задача'),
+        ),
+        migrations.AddField(
+            model_name='taskrecurrence',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_recurrences', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='taskrecurrence',
+            index=models.Index(fields=['user', 'until'], name='recurrence_user_until_idx'),
+        ),
+    ]
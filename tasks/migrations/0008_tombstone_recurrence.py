@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_recurrence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='kind',
+            field=models.CharField(choices=[('task', 'Задача'), ('priority', 'Приоритет'), ('recurrence', 'Правило повторения')], max_length=10, verbose_name='Тип объекта'),
+        ),
+    ]
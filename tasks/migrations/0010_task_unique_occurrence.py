@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+from backend.migration_operations import AddUniqueConstraintConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0009_drop_redundant_fk_index'),
+    ]
+
+    operations = [
+        AddUniqueConstraintConcurrently(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('recurrence_parent', 'occurrence_date'), name='task_unique_occurrence'),
+        ),
+    ]
@@ -1,6 +1,13 @@
 import uuid
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.models import UserProfile
+from . import search
+from .priority_cache import invalidate_user_priorities
 
 
 class CustomPriority(models.Model):
@@ -18,6 +25,10 @@ class CustomPriority(models.Model):
         verbose_name = "Пользовательский приоритет"
         verbose_name_plural = "Пользовательские приоритеты"
         ordering = ["display_name"]
+        indexes = [
+            # Дельта-синхронизация: изменения после курсора клиента
+            models.Index(fields=["user", "updated_at"], name="priority_user_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.display_name} ({self.user.username})"
@@ -32,14 +43,154 @@ class Task(models.Model):
     date = models.DateField(verbose_name="Дата")
     priority = models.CharField(max_length=50, default="normal", verbose_name="Приоритет")
     completed = models.BooleanField(default=False, verbose_name="Выполнено")
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tasks", verbose_name="Пользователь")
+    # Отдельный индекс по user не нужен: его покрывают составные индексы (user, ...)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tasks", db_index=False, verbose_name="Пользователь")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Заполняется триггером PostgreSQL (см. tasks.search); на SQLite не используется
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name="Поисковый вектор")
+    # Материализованное повторение: задача-шаблон с правилом и дата повторения
+    recurrence_parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, editable=False,
+        db_index=False, related_name="occurrences", verbose_name="Повторяющаяся задача"
+    )
+    occurrence_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Дата повторения")
 
     class Meta:
         verbose_name = "Задача"
         verbose_name_plural = "Задачи"
         ordering = ["date", "time"]
+        indexes = [
+            # Выборки по дате (today/week/month) и курсорная пагинация
+            models.Index(fields=["user", "date", "time", "id"], name="task_user_date_time_idx"),
+            # Выполненные/невыполненные задачи в порядке календаря
+            models.Index(fields=["user", "completed", "date", "time"], name="task_user_completed_idx"),
+            # Фильтр по приоритету
+            models.Index(fields=["user", "priority", "date", "time"], name="task_user_priority_idx"),
+            # Дельта-синхронизация: изменения после курсора клиента
+            models.Index(fields=["user", "updated_at"], name="task_user_updated_idx"),
+        ]
+        constraints = [
+            # Одно повторение материализуется не больше одного раза
+            models.UniqueConstraint(
+                fields=["recurrence_parent", "occurrence_date"], name="task_unique_occurrence"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.date} {self.time})"
+
+
+class TaskRecurrence(models.Model):
+    """
+    Правило повторения задачи.
+
+    Задача, к которой привязано правило, — шаблон и первое повторение.
+    Остальные повторения не хранятся, а вычисляются при выборке за период
+    (см. tasks.recurrence); строка Task создается только когда пользователь
+    выполняет или меняет отдельное повторение.
+    """
+    
+    FREQUENCY_CHOICES = [
+        ('daily', 'Ежедневно'),
+        ('weekly', 'Еженедельно'),
+        ('monthly', 'Ежемесячно'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, related_name="recurrence", verbose_name="Задача")
+    # Отдельный индекс по user не нужен: его покрывает recurrence_user_until_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_recurrences", db_index=False, verbose_name="Пользователь")
+    frequency = models.CharField(max_length=8, choices=FREQUENCY_CHOICES, verbose_name="Частота")
+    interval = models.PositiveSmallIntegerField(default=1, verbose_name="Интервал")
+    until = models.DateField(null=True, blank=True, verbose_name="Повторять до")
+    # Даты (YYYY-MM-DD), для которых повторение удалено пользователем
+    excluded_dates = models.JSONField(default=list, blank=True, verbose_name="Исключенные даты")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Правило повторения"
+        verbose_name_plural = "Правила повторения"
+        indexes = [
+            # Правила пользователя, действующие в запрошенном периоде
+            models.Index(fields=["user", "until"], name="recurrence_user_until_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} / {self.interval} ({self.task_id})"
+
+
+class Tombstone(models.Model):
+    """Отметка об удаленной задаче или приоритете для дельта-синхронизации клиентов"""
+    
+    KIND_CHOICES = [
+        ('task', 'Задача'),
+        ('priority', 'Приоритет'),
+        ('recurrence', 'Правило повторения'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tombstones", verbose_name="Пользователь")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Тип объекта")
+    # Для правила повторения — id задачи-шаблона (правило у задачи одно)
+    object_id = models.UUIDField(verbose_name="ID удаленного объекта")
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата удаления")
+
+    class Meta:
+        verbose_name = "Удаленный объект"
+        verbose_name_plural = "Удаленные объекты"
+        ordering = ["deleted_at"]
+        indexes = [
+            models.Index(fields=["user", "deleted_at"], name="tombstone_user_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} ({self.deleted_at})"
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=CustomPriority)
+@receiver(post_delete, sender=TaskRecurrence)
+def create_tombstone(sender, instance, origin=None, **kwargs):
+    """Запоминаем удаление, чтобы синхронизация могла сообщить о нем клиентам"""
+    # При удалении самого пользователя отметки не нужны (и удалились бы вместе с ним)
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    if sender is TaskRecurrence:
+        # Правило, удаленное вместе с задачей, покрывается отметкой о задаче
+        if isinstance(origin, Task) or getattr(origin, 'model', None) is Task:
+            return
+        Tombstone.objects.create(user_id=instance.user_id, kind='recurrence', object_id=instance.task_id)
+        return
+    kind = 'task' if sender is Task else 'priority'
+    Tombstone.objects.create(user_id=instance.user_id, kind=kind, object_id=instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def update_search_index(sender, instance, **kwargs):
+    """Обновляем запись полнотекстового индекса SQLite (на PostgreSQL — триггер)"""
+    search.index_tasks([instance])
+
+
+@receiver(post_save, sender=UserProfile)
+def reindex_search_on_language_change(sender, instance, created, update_fields=None, **kwargs):
+    """Поисковые векторы задач строятся с конфигурацией языка профиля — пересчитываем при его смене"""
+    if created or (update_fields is not None and 'language' not in update_fields):
+        return
+    user_id = instance.user_id
+    transaction.on_commit(lambda: search.reindex_user(user_id))
+
+
+@receiver(post_delete, sender=Task)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_tasks([instance.pk])
+
+
+@receiver(post_save, sender=CustomPriority)
+@receiver(post_delete, sender=CustomPriority)
+def reset_priority_cache(sender, instance, **kwargs):
+    """Сброс кэша допустимых приоритетов при изменении пользовательских приоритетов"""
+    user_id = instance.user_id
+    invalidate_user_priorities(user_id)
+    # Повторно после коммита, чтобы не остался кэш, заполненный параллельным запросом до коммита
+    transaction.on_commit(lambda: invalidate_user_priorities(user_id))
@@ -0,0 +1,10 @@
+from django.conf import settings
+
+from backend.pagination import KeysetPagination
+
+
+class TaskCursorPagination(KeysetPagination):
+    """Курсорная пагинация задач в порядке (date, time, id)"""
+    ordering = ('date', 'time', 'id')
+    page_size = settings.TASKS_PAGE_SIZE
+    max_page_size = settings.TASKS_MAX_PAGE_SIZE
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# Стандартные приоритеты, доступные всем пользователям
+STANDARD_PRIORITIES = frozenset({'urgent', 'normal', 'low'})
+
+
+def _cache_key(user_id):
+    return f'tasks:priorities:{user_id}'
+
+
+def get_user_priority_names(user_id):
+    """Имена пользовательских приоритетов (из кэша, при промахе — одним запросом)"""
+    key = _cache_key(user_id)
+    names = cache.get(key)
+    if names is None:
+        from .models import CustomPriority
+
+        names = frozenset(
+            CustomPriority.objects.filter(user_id=user_id).values_list('name', flat=True)
+        )
+        cache.set(key, names, settings.TASKS_PRIORITY_CACHE_TIMEOUT)
+    return names
+
+
+def is_valid_priority(user_id, name):
+    """
+    Проверка приоритета: стандартный или созданный пользователем.
+
+    Кэш сбрасывается сигналами только в текущем процессе, поэтому при
+    локальном кэше другой воркер может не знать о только что созданном
+    приоритете: перед отказом проверяем БД и обновляем кэш.
+    """
+    if name in STANDARD_PRIORITIES or name in get_user_priority_names(user_id):
+        return True
+    from .models import CustomPriority
+
+    if CustomPriority.objects.filter(user_id=user_id, name=name).exists():
+        invalidate_user_priorities(user_id)
+        return True
+    return False
+
+
+def invalidate_user_priorities(user_id):
+    """Сброс кэша приоритетов пользователя"""
+    cache.delete(_cache_key(user_id))
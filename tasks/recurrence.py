@@ -0,0 +1,128 @@
+"""
+Ленивое раскрытие повторяющихся задач.
+
+Повторения не хранятся в таблице задач: для запрошенного периода даты
+вычисляются арифметически из правила (без перебора дней с начала
+повторения), а строки строятся из задачи-шаблона в том же формате, что и
+`task_values_serializer.values()`. Материализованные повторения — обычные
+строки Task с `recurrence_parent` и `occurrence_date`; их даты при
+раскрытии пропускаются.
+"""
+import calendar
+import uuid
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def occurrence_id(parent_id, day):
+    """Детерминированный id повторения: совпадает у виртуальной и материализованной строки"""
+    return uuid.uuid5(parent_id, day.isoformat())
+
+
+def _add_months(day, months):
+    year, month = divmod(day.month - 1 + months, 12)
+    year += day.year
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_dates(frequency, interval, until, start, window_start, window_end):
+    """Даты повторений в окне [window_start, window_end], не считая даты самого шаблона"""
+    end = window_end if until is None else min(window_end, until)
+    if end <= start:
+        return
+    if frequency == 'monthly':
+        # Считаем от даты шаблона, чтобы 31-е число не «сползало» после коротких месяцев
+        months = (window_start.year - start.year) * 12 + window_start.month - start.month
+        step = max(1, -(-months // interval))
+        while True:
+            day = _add_months(start, step * interval)
+            if day > end:
+                return
+            if day >= window_start:
+                yield day
+            step += 1
+    else:
+        days = interval * (7 if frequency == 'weekly' else 1)
+        step = max(1, -(-(window_start - start).days // days))
+        day = start + timedelta(days=step * days)
+        while day <= end:
+            yield day
+            day += timedelta(days=days)
+
+
+def is_occurrence(rule, start, day):
+    """Дата является повторением правила (и не исключена пользователем)"""
+    return (
+        day.isoformat() not in rule.excluded_dates
+        and any(occurrence_dates(rule.frequency, rule.interval, rule.until, start, day, day))
+    )
+
+
+def expand(user, window_start, window_end, values_serializer):
+    """
+    Виртуальные повторения задач пользователя за период.
+
+    Два запроса: правила вместе с полями шаблонов (по индексу user, until) и
+    даты уже материализованных повторений этих шаблонов.
+    """
+    from .models import Task, TaskRecurrence
+
+    sources = [source for _, source, _ in values_serializer.fields]
+    rules = list(
+        TaskRecurrence.objects
+        .filter(user=user, task__date__lt=window_end)
+        .filter(Q(until__isnull=True) | Q(until__gte=window_start))
+        .values('frequency', 'interval', 'until', 'excluded_dates', *(f'task__{source}' for source in sources))
+    )
+    if not rules:
+        return []
+
+    materialized = set(
+        Task.objects
+        .filter(recurrence_parent__in=[rule['task__id'] for rule in rules],
+                occurrence_date__range=[window_start, window_end])
+        .values_list('recurrence_parent_id', 'occurrence_date')
+    )
+
+    rows = []
+    for rule in rules:
+        template = {source: rule[f'task__{source}'] for source in sources}
+        parent_id = template['id']
+        excluded = set(rule['excluded_dates'])
+        for day in occurrence_dates(rule['frequency'], rule['interval'], rule['until'],
+                                    template['date'], window_start, window_end):
+            if (parent_id, day) in materialized or day.isoformat() in excluded:
+                continue
+            row = dict(template)
+            row.update(
+                id=occurrence_id(parent_id, day),
+                date=day,
+                completed=False,
+                recurrence_parent=parent_id,
+                occurrence_date=day,
+            )
+            rows.append(row)
+    return rows
+
+
+def exclude_dates(dates_by_parent):
+    """
+    Исключить даты повторений (удаленные пользователем), чтобы они не
+    появлялись снова при раскрытии. Вызывается внутри транзакции.
+    """
+    from .models import Task, TaskRecurrence
+
+    dates_by_parent = {parent_id: dates for parent_id, dates in dates_by_parent.items() if dates}
+    if not dates_by_parent:
+        return
+    for rule in TaskRecurrence.objects.select_for_update().filter(task_id__in=dates_by_parent):
+        excluded = set(rule.excluded_dates)
+        added = {day.isoformat() for day in dates_by_parent[rule.task_id]} - excluded
+        if added:
+            rule.excluded_dates = sorted(excluded | added)
+            rule.save(update_fields=['excluded_dates', 'updated_at'])
+    # Меняем updated_at шаблонов: от него зависят ETag списков и дельта-синхронизация
+    Task.objects.filter(pk__in=dates_by_parent).update(updated_at=timezone.now())
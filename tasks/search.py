@@ -0,0 +1,166 @@
+"""
+Полнотекстовый поиск по задачам.
+
+PostgreSQL: колонка `Task.search_vector` (tsvector) заполняется триггером
+при вставке и изменении title/description с конфигурацией russian/english
+по языку владельца; поиск идет по GIN индексу.
+
+SQLite (USE_SQLITE): теневая таблица FTS5 `tasks_task_fts`, которую
+поддерживают сигналы модели и пакетные операции. Строка FTS адресуется
+rowid, вычисленным из UUID задачи, поэтому обновление и удаление — поиск
+по ключу, а не сканирование таблицы.
+"""
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import F
+
+FTS_TABLE = 'tasks_task_fts'
+# Размер пачки при переиндексации: каждая пачка — отдельный короткий UPDATE
+REINDEX_BATCH_SIZE = 2000
+
+# Конфигурации полнотекстового поиска PostgreSQL по языку профиля
+SEARCH_CONFIGS = {'ru': 'russian', 'en': 'english'}
+DEFAULT_SEARCH_CONFIG = 'russian'
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+def search_config_for(user):
+    """Конфигурация поиска по языку пользователя"""
+    profile = getattr(user, 'profile', None)
+    return SEARCH_CONFIGS.get(getattr(profile, 'language', None), DEFAULT_SEARCH_CONFIG)
+
+
+def fts_rowid(task_id):
+    """Положительный 63-битный rowid FTS из UUID задачи"""
+    return task_id.int >> 65
+
+
+def index_tasks(tasks):
+    """Обновить записи FTS для задач (на PostgreSQL индекс ведет триггер)"""
+    if not uses_fts5() or not tasks:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(fts_rowid(task.pk),) for task in tasks]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, task_id, user_id, title, description) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [
+                (fts_rowid(task.pk), task.pk.hex, task.user_id, task.title, task.description)
+                for task in tasks
+            ]
+        )
+
+
+def remove_tasks(task_ids):
+    """Удалить записи FTS для задач"""
+    if not uses_fts5() or not task_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(fts_rowid(task_id),) for task_id in task_ids]
+        )
+
+
+def search_task_ids(user, text, limit, offset=0):
+    """ID задач пользователя, подходящих под запрос, в порядке релевантности"""
+    if uses_fts5():
+        return _search_fts5(user, text, limit, offset)
+    return _search_postgres(user, text, limit, offset)
+
+
+def _search_postgres(user, text, limit, offset):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+    from .models import Task
+
+    query = SearchQuery(text, config=search_config_for(user), search_type='websearch')
+    return list(
+        Task.objects.filter(user=user, search_vector=query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', 'date', 'time', 'id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
+
+
+def _search_fts5(user, text, limit, offset):
+    # Пользовательский ввод не передаем в синтаксис MATCH как есть:
+    # каждое слово — отдельный префиксный терм, все термы обязательны
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return []
+    match = ' '.join(f'"{word}"*' for word in words)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT task_id FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND user_id = %s '
+            f'ORDER BY bm25({FTS_TABLE}, 0, 0, 10.0, 1.0) LIMIT %s OFFSET %s',
+            [match, user.pk, limit, offset]
+        )
+        return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+def rebuild_index(user_id=None):
+    """Полная переиндексация задач (всех или одного пользователя)"""
+    from .models import Task
+
+    tasks = Task.objects.all()
+    if user_id is not None:
+        tasks = tasks.filter(user_id=user_id)
+
+    if not uses_fts5():
+        return touch_in_batches(tasks)
+
+    count = 0
+    with connection.cursor() as cursor:
+        if user_id is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        else:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE user_id = %s', [user_id])
+    batch = []
+    for task in tasks.only('id', 'user_id', 'title', 'description').iterator(chunk_size=REINDEX_BATCH_SIZE):
+        batch.append(task)
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            index_tasks(batch)
+            count += len(batch)
+            batch = []
+    index_tasks(batch)
+    return count + len(batch)
+
+
+def touch_in_batches(tasks, batch_size=REINDEX_BATCH_SIZE):
+    """
+    PostgreSQL: пересчитать search_vector триггером (UPDATE OF title)
+    пачками по id, чтобы не переписывать и не блокировать всю таблицу
+    одним запросом. Принимает QuerySet задач (в том числе исторической
+    модели в миграции).
+    """
+    ids = tasks.order_by('pk').values_list('pk', flat=True)
+    count = 0
+    last_id = None
+    while True:
+        batch = list((ids if last_id is None else ids.filter(pk__gt=last_id))[:batch_size])
+        if not batch:
+            return count
+        count += tasks.model._default_manager.filter(pk__in=batch).update(title=F('title'))
+        last_id = batch[-1]
+
+
+def reindex_user(user_id):
+    """
+    Переиндексация задач пользователя после смены языка: на PostgreSQL
+    конфигурация поиска (russian/english) выбирается по языку профиля.
+    Токенизатор FTS5 от языка не зависит.
+    """
+    if uses_fts5():
+        return 0
+    return rebuild_index(user_id)
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Task, CustomPriority
+from backend.fast_serializers import ValuesSerializer
+from .models import Task, CustomPriority, TaskRecurrence
+from .priority_cache import is_valid_priority
 
 
 class CustomPrioritySerializer(serializers.ModelSerializer):
@@ -21,8 +23,11 @@ class TaskSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'time', 'date', 'priority', 'completed', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = [
+            'id', 'title', 'description', 'time', 'date', 'priority', 'completed',
+            'recurrence_parent', 'occurrence_date', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'recurrence_parent', 'occurrence_date', 'created_at', 'updated_at']
         
     def create(self, validated_data):
         """Автоматически устанавливаем пользователя из запроса"""
@@ -31,25 +36,53 @@ class TaskSerializer(serializers.ModelSerializer):
         
     def validate_priority(self, value):
         """Валидация приоритета"""
-        # Проверяем, что приоритет существует в стандартных вариантах или у пользователя
+        # Стандартные и пользовательские приоритеты проверяются по кэшу; БД — только при промахе
         user = self.context['request'].user
-        standard_priorities = ['urgent', 'normal', 'low']
-        
-        if value in standard_priorities:
-            return value
-            
-        # Проверяем пользовательские приоритеты
-        user_priorities = CustomPriority.objects.filter(user=user, name=value)
-        if user_priorities.exists():
+        if is_valid_priority(user.id, value):
             return value
             
         raise serializers.ValidationError(f"Неверный приоритет: {value}")
 
 
+# Быстрый read-only путь для списков задач (тот же JSON, что и TaskSerializer)
+task_values_serializer = ValuesSerializer(TaskSerializer)
+
+
+class TaskRecurrenceSerializer(serializers.ModelSerializer):
+    """Сериализатор правила повторения задачи"""
+    
+    class Meta:
+        model = TaskRecurrence
+        fields = ['task', 'frequency', 'interval', 'until', 'excluded_dates', 'created_at', 'updated_at']
+        read_only_fields = ['task', 'excluded_dates', 'created_at', 'updated_at']
+    
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Интервал должен быть не меньше 1")
+        return value
+
+
 class TaskCompletionSerializer(serializers.ModelSerializer):
     """Специальный сериализатор для отметки выполнения задач"""
     
     class Meta:
         model = Task
         fields = ['id', 'completed']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+
+class TaskBulkOperationSerializer(serializers.Serializer):
+    """Одна операция пакетного изменения задач"""
+    OPERATIONS = ['create', 'update', 'complete', 'uncomplete', 'delete']
+    
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    id = serializers.UUIDField(required=False)
+    data = serializers.DictField(required=False, default=dict)
+    
+    def validate(self, attrs):
+        """Для всех операций, кроме create, нужен id задачи"""
+        if attrs['op'] == 'create':
+            attrs.pop('id', None)
+        elif 'id' not in attrs:
+            raise serializers.ValidationError({'id': f"Обязательное поле для операции {attrs['op']}"})
+        return attrs
@@ -1,3 +1,645 @@
-from django.test import TestCase
+import datetime
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import async_views, recurrence, search as task_search
+from users.models import UserProfile
+from .models import CustomPriority, Task, TaskRecurrence, Tombstone
+from .pagination import TaskCursorPagination
+
+
+class QueryPlanTestMixin:
+    """Проверки плана запроса: выборка должна идти по индексу, а не полным сканированием"""
+
+    @classmethod
+    def analyze(cls):
+        """Обновляем статистику планировщика после заполнения таблиц"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan, plan)
+        else:
+            # SQLite: "SCAN <table>" означает полный проход по таблице
+            full_scans = [
+                line for line in plan.splitlines()
+                if f'SCAN {table}' in line and 'USING' not in line
+            ]
+            self.assertEqual(full_scans, [], plan)
+        self.assertIn('_idx', plan, plan)
+
+
+class TaskQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """Регрессионный бенчмарк: основные выборки задач на большом объеме данных"""
+    USERS = 50
+    TASKS_PER_USER = 400
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(username=f'plan_user_{i}') for i in range(cls.USERS)
+        )
+        start = datetime.date(2024, 1, 1)
+        priorities = ['urgent', 'normal', 'low']
+        Task.objects.bulk_create(
+            (
+                Task(
+                    user=user,
+                    title=f'Задача {i}',
+                    date=start + datetime.timedelta(days=i % 365),
+                    time=datetime.time(i % 24, 0),
+                    priority=priorities[i % 3],
+                    completed=i % 4 == 0,
+                )
+                for user in users
+                for i in range(cls.TASKS_PER_USER)
+            ),
+            batch_size=1000,
+        )
+        cls.user = users[0]
+        cls.analyze()
+
+    def test_date_range(self):
+        week_start = datetime.date(2024, 3, 4)
+        self.assertUsesIndex(Task.objects.filter(
+            user=self.user,
+            date__range=[week_start, week_start + datetime.timedelta(days=6)],
+        ))
+
+    def test_single_day(self):
+        self.assertUsesIndex(Task.objects.filter(user=self.user, date=datetime.date(2024, 3, 4)))
+
+    def test_completed(self):
+        self.assertUsesIndex(Task.objects.filter(user=self.user, completed=True))
+
+    def test_priority(self):
+        self.assertUsesIndex(Task.objects.filter(user=self.user, priority='urgent'))
+
+    def test_cursor_page(self):
+        self.assertUsesIndex(
+            Task.objects.filter(user=self.user, date__gt=datetime.date(2024, 6, 1))
+            .order_by('date', 'time', 'id')[:50]
+        )
+
+
+
+class ApiTestMixin:
+    """Клиент с токеном нового пользователя"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username=f'api_{self.__class__.__name__}')
+        token = Token.objects.create(user=self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+    def create_task(self, **fields):
+        fields.setdefault('title', 'Задача')
+        fields.setdefault('date', timezone.now().date())
+        fields.setdefault('time', datetime.time(9, 0))
+        return Task.objects.create(user=self.user, **fields)
+
+
+class TaskListETagTests(ApiTestMixin, TestCase):
+    """Условный GET списков задач"""
+
+    def get_with_etag(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get('/api/tasks/tasks/today/')['ETag']
+        self.assertEqual(self.get_with_etag('/api/tasks/tasks/today/', etag).status_code, 304)
+
+    def test_next_day_invalidates_period_lists(self):
+        now = timezone.now()
+        for name in ('today', 'week', 'month'):
+            url = f'/api/tasks/tasks/{name}/'
+            with mock.patch('django.utils.timezone.now', return_value=now):
+                etag = self.client.get(url)['ETag']
+            later = now + datetime.timedelta(days=31)
+            with mock.patch('django.utils.timezone.now', return_value=later):
+                response = self.get_with_etag(url, etag)
+            self.assertEqual(response.status_code, 200, name)
+
+    def test_new_task_invalidates_list(self):
+        etag = self.client.get('/api/tasks/tasks/').get('ETag')
+        self.create_task(title='Новая')
+        self.assertEqual(self.get_with_etag('/api/tasks/tasks/', etag).status_code, 200)
+
+
+
+class TaskRecurrenceTests(ApiTestMixin, TestCase):
+    """Повторяющиеся задачи: раскрытие за период, материализация и исключения"""
+    start = datetime.date(2024, 1, 1)
+
+    def create_recurring(self, frequency='daily', interval=1, **fields):
+        fields.setdefault('date', self.start)
+        template = self.create_task(**fields)
+        response = self.client.put(
+            f'/api/tasks/tasks/{template.pk}/recurrence/',
+            {'frequency': frequency, 'interval': interval},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return template
+
+    def day_list(self, day, **params):
+        return self.client.get('/api/tasks/tasks/', {'date': day.isoformat(), **params}).json()
+
+    def test_occurrence_dates_match_brute_force(self):
+        for frequency, interval, step in (('daily', 3, 3), ('weekly', 2, 14)):
+            for offset in (0, 1, 10, 45):
+                window_start = self.start + datetime.timedelta(days=offset)
+                window_end = window_start + datetime.timedelta(days=30)
+                expected = [
+                    self.start + datetime.timedelta(days=n * step)
+                    for n in range(1, 100)
+                    if window_start <= self.start + datetime.timedelta(days=n * step) <= window_end
+                ]
+                actual = list(recurrence.occurrence_dates(
+                    frequency, interval, None, self.start, window_start, window_end
+                ))
+                self.assertEqual(actual, expected, (frequency, offset))
+
+    def test_monthly_keeps_day_of_month(self):
+        dates = recurrence.occurrence_dates(
+            'monthly', 1, None, datetime.date(2024, 1, 31),
+            datetime.date(2024, 2, 1), datetime.date(2024, 4, 30)
+        )
+        self.assertEqual(list(dates), [
+            datetime.date(2024, 2, 29), datetime.date(2024, 3, 31), datetime.date(2024, 4, 30)
+        ])
+
+    def test_expansion_across_ranges(self):
+        template = self.create_recurring('weekly')
+
+        self.assertEqual([row['id'] for row in self.day_list(self.start)], [str(template.pk)])
+        [row] = self.day_list(datetime.date(2024, 1, 8))
+        self.assertEqual(row['recurrence_parent'], str(template.pk))
+        self.assertEqual(self.day_list(datetime.date(2024, 1, 9)), [])
+
+        response = self.client.get('/api/tasks/tasks/calendar/', {'start': '2024-01-01', 'end': '2024-03-31'})
+        days = [day['date'] for day in response.json()['days']]
+        self.assertEqual(len(days), 13)
+        self.assertEqual(days[-1], '2024-03-25')
+
+    def test_materialization_is_idempotent(self):
+        template = self.create_recurring()
+        day = datetime.date(2024, 1, 5)
+        [virtual] = self.day_list(day)
+        url = f'/api/tasks/tasks/{template.pk}/occurrence/'
+
+        first = self.client.post(url, {'occurrence_date': day.isoformat(), 'title': 'Изменено'},
+                                 content_type='application/json')
+        second = self.client.post(url, {'occurrence_date': day.isoformat()}, content_type='application/json')
+
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.json()['id'], virtual['id'])
+        self.assertEqual(second.json()['id'], virtual['id'])
+        self.assertEqual(str(recurrence.occurrence_id(template.pk, day)), virtual['id'])
+        [row] = self.day_list(day)
+        self.assertEqual((row['id'], row['title']), (virtual['id'], 'Изменено'))
+
+    def test_excluded_dates_are_not_expanded(self):
+        template = self.create_recurring()
+        day = datetime.date(2024, 1, 3)
+        response = self.client.delete(f'/api/tasks/tasks/{template.pk}/occurrence/?occurrence_date={day}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.day_list(day), [])
+
+        # Удаленное материализованное повторение тоже исключается
+        other = datetime.date(2024, 1, 4)
+        self.client.post(f'/api/tasks/tasks/{template.pk}/occurrence/', {'occurrence_date': other.isoformat()},
+                         content_type='application/json')
+        self.client.delete(f'/api/tasks/tasks/{recurrence.occurrence_id(template.pk, other)}/')
+        self.assertEqual(self.day_list(other), [])
+        self.assertEqual(
+            TaskRecurrence.objects.get(task=template).excluded_dates, [day.isoformat(), other.isoformat()]
+        )
+
+    def test_keyset_pages_mix_real_and_virtual_rows(self):
+        day = datetime.date(2024, 1, 10)
+        for hour in (8, 10, 12):
+            self.create_task(date=day, time=datetime.time(hour, 0))
+        for hour in (9, 11, 13):
+            self.create_recurring(time=datetime.time(hour, 0))
+
+        rows = []
+        params = {'page_size': 2}
+        while True:
+            page = self.day_list(day, **params)
+            self.assertLessEqual(len(page['results']), 2)
+            rows += page['results']
+            if not page['next_cursor']:
+                break
+            params = {'page_size': 2, 'cursor': page['next_cursor']}
+
+        self.assertEqual([row['time'][:2] for row in rows], ['08', '09', '10', '11', '12', '13'])
+        self.assertEqual(len({row['id'] for row in rows}), 6)
+        self.assertEqual(sum(1 for row in rows if row['recurrence_parent']), 3)
+
+    def test_complete_virtual_occurrence(self):
+        template = self.create_recurring()
+        day = datetime.date(2024, 1, 6)
+        [virtual] = self.day_list(day)
+        url = f"/api/tasks/tasks/{virtual['id']}/complete/"
+
+        response = self.client.patch(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('occurrence', response.json()['error'])
+
+        response = self.client.patch(
+            url, {'recurrence_parent': str(template.pk), 'occurrence_date': day.isoformat()},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Task.objects.get(pk=virtual['id']).completed)
+        [row] = self.day_list(day)
+        self.assertEqual((row['id'], row['completed']), (virtual['id'], True))
+
+    def test_malformed_occurrence_bodies(self):
+        template = self.create_recurring()
+        virtual_id = recurrence.occurrence_id(template.pk, datetime.date(2024, 1, 2))
+        response = self.client.patch(f'/api/tasks/tasks/{virtual_id}/complete/', '[]',
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        for body in ('[]', '{"occurrence_date": 20240102}'):
+            response = self.client.post(f'/api/tasks/tasks/{template.pk}/occurrence/', body,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_sync_includes_recurrence_rules(self):
+        cursor = self.client.get('/api/tasks/tasks/sync/').json()['cursor']
+        template = self.create_recurring()
+        self.client.delete(f'/api/tasks/tasks/{template.pk}/occurrence/?occurrence_date=2024-01-02')
+
+        payload = self.client.get('/api/tasks/tasks/sync/', {'since': cursor}).json()
+        [rule] = payload['recurrences']
+        self.assertEqual((rule['task'], rule['excluded_dates']), (str(template.pk), ['2024-01-02']))
+
+        cursor = payload['cursor']
+        self.client.delete(f'/api/tasks/tasks/{template.pk}/recurrence/')
+        payload = self.client.get('/api/tasks/tasks/sync/', {'since': cursor}).json()
+        self.assertEqual(payload['deleted']['recurrences'], [str(template.pk)])
+
+    def test_occurrence_is_unique_in_database(self):
+        template = self.create_recurring()
+        day = datetime.date(2024, 1, 5)
+        self.create_task(recurrence_parent=template, occurrence_date=day, date=day)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_task(recurrence_parent=template, occurrence_date=day, date=day)
+
+
+
+class TaskBulkTests(ApiTestMixin, TestCase):
+    """Пакетные операции: проверка, индексы ошибок и атомарность"""
+    url = '/api/tasks/tasks/bulk/'
+
+    def bulk(self, operations):
+        return self.client.post(self.url, {'operations': operations}, content_type='application/json')
+
+    def test_batch_shape_is_validated(self):
+        self.assertEqual(self.bulk([]).status_code, 400)
+        response = self.client.post(self.url, [], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.bulk([{'op': 'rename', 'id': str(self.create_task().pk)}])
+        self.assertIn('op', response.json()['operations'][0])
+        response = self.bulk([{'op': 'update', 'data': {'title': 'Без id'}}])
+        self.assertIn('id', response.json()['operations'][0])
+
+    def test_errors_are_reported_by_index_and_nothing_is_written(self):
+        task = self.create_task(title='Старое')
+        response = self.bulk([
+            {'op': 'update', 'id': str(task.pk), 'data': {'title': 'Новое'}},
+            {'op': 'create', 'data': {'title': 'Без даты'}},
+            {'op': 'complete', 'id': '00000000-0000-0000-0000-000000000000'},
+            {'op': 'delete', 'id': str(task.pk)},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['valid', 'error', 'error', 'error'])
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertIn('date', results[1]['errors'])
+        self.assertIn('id', results[2]['errors'])
+        self.assertIn('id', results[3]['errors'])
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Старое')
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+
+    def test_failure_while_applying_rolls_back(self):
+        task = self.create_task(title='Старое')
+        with mock.patch('tasks.search.index_tasks', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.bulk([
+                    {'op': 'create', 'data': {'title': 'Новая', 'date': '2024-01-01', 'time': '09:00'}},
+                    {'op': 'update', 'id': str(task.pk), 'data': {'title': 'Новое'}},
+                ])
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Старое')
+        self.assertFalse(Task.objects.filter(title='Новая').exists())
+
+    def test_update_writes_only_fields_of_its_operation(self):
+        first = self.create_task(title='Первая', priority='normal')
+        second = self.create_task(title='Вторая', priority='normal')
+        # Параллельное изменение, которого нет в загруженных пакетом строках
+        original_in_bulk = type(Task.objects.all()).in_bulk
+
+        def in_bulk_then_change(queryset, *args, **kwargs):
+            loaded = original_in_bulk(queryset, *args, **kwargs)
+            Task.objects.filter(pk=second.pk).update(priority='low')
+            return loaded
+
+        with mock.patch.object(type(Task.objects.all()), 'in_bulk', in_bulk_then_change):
+            response = self.bulk([
+                {'op': 'update', 'id': str(first.pk), 'data': {'priority': 'urgent'}},
+                {'op': 'update', 'id': str(second.pk), 'data': {'title': 'Вторая!'}},
+            ])
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual((second.title, second.priority), ('Вторая!', 'low'))
+
+    def test_mixed_operations(self):
+        done, todo, gone = (self.create_task(title=title) for title in ('done', 'todo', 'gone'))
+        response = self.bulk([
+            {'op': 'complete', 'id': str(done.pk)},
+            {'op': 'create', 'data': {'title': 'Новая', 'date': '2024-01-01', 'time': '09:00'}},
+            {'op': 'update', 'id': str(todo.pk), 'data': {'title': 'Изменено'}},
+            {'op': 'delete', 'id': str(gone.pk)},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['ok'] * 4)
+        self.assertEqual(results[1]['task']['title'], 'Новая')
+        self.assertTrue(Task.objects.get(pk=done.pk).completed)
+        self.assertEqual(Task.objects.get(pk=todo.pk).title, 'Изменено')
+        self.assertFalse(Task.objects.filter(pk=gone.pk).exists())
+
+
+
+class TaskKeysetPaginationTests(ApiTestMixin, TestCase):
+    """Курсорная пагинация задач"""
+    url = '/api/tasks/tasks/'
+
+    def setUp(self):
+        super().setUp()
+        day = datetime.date(2024, 5, 1)
+        # Одинаковые date и time: порядок внутри группы задает только id
+        self.tasks = [self.create_task(title=f'Задача {i}', date=day) for i in range(7)]
+
+    def pages(self, **params):
+        page = self.client.get(self.url, params).json()
+        yield page
+        while page['next_cursor']:
+            page = self.client.get(self.url, {**params, 'cursor': page['next_cursor']}).json()
+            yield page
+
+    def test_ties_on_ordering_key(self):
+        ids = [row['id'] for page in self.pages(page_size=3) for row in page['results']]
+        self.assertEqual(ids, sorted(str(task.pk) for task in self.tasks))
+
+    def test_cursor_is_stable_under_inserts_and_deletes(self):
+        first = self.client.get(self.url, {'page_size': 3}).json()
+        seen = [row['id'] for row in first['results']]
+        # Изменения перед уже выданной позицией не сдвигают следующую страницу
+        Task.objects.filter(pk=seen[0]).delete()
+        self.create_task(date=datetime.date(2024, 4, 30))
+
+        rest = self.client.get(self.url, {'page_size': 10, 'cursor': first['next_cursor']}).json()
+        remaining = sorted(str(task.pk) for task in self.tasks)[3:]
+        self.assertEqual([row['id'] for row in rest['results']], remaining)
+        self.assertIsNone(rest['next_cursor'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('не-курсор', 'WyIyMDI0LTA1LTAxIl0', 'bm90IGpzb24'):
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.json())
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(TaskCursorPagination, 'max_page_size', 4), \
+                mock.patch.object(TaskCursorPagination, 'page_size', 2):
+            self.assertEqual(len(self.client.get(self.url, {'page_size': 1000}).json()['results']), 4)
+            self.assertEqual(len(self.client.get(self.url, {'page_size': 0}).json()['results']), 2)
+            self.assertEqual(len(self.client.get(self.url, {'page_size': 'x'}).json()['results']), 2)
+
+    def test_plain_list_without_pagination_params(self):
+        self.assertEqual(len(self.client.get(self.url).json()), 7)
+
+
+class TaskSyncTests(ApiTestMixin, TestCase):
+    """Дельта-синхронизация задач"""
+    url = '/api/tasks/tasks/sync/'
+
+    def sync(self, since=None):
+        return self.client.get(self.url, {'since': since} if since else {}).json()
+
+    def test_first_sync_is_full_snapshot(self):
+        self.create_task()
+        payload = self.sync()
+        self.assertTrue(payload['full'])
+        self.assertEqual(len(payload['tasks']), 1)
+
+    def test_deletions_are_reported_as_tombstones(self):
+        task = self.create_task()
+        priority = CustomPriority.objects.create(user=self.user, name='своя', display_name='Своя')
+        task_id, priority_id = str(task.pk), str(priority.pk)
+        cursor = self.sync()['cursor']
+        task.delete()
+        priority.delete()
+
+        payload = self.sync(cursor)
+        self.assertFalse(payload['full'])
+        self.assertEqual(payload['deleted']['tasks'], [task_id])
+        self.assertEqual(payload['deleted']['priorities'], [priority_id])
+        self.assertEqual(payload['tasks'], [])
+
+    def test_since_boundary(self):
+        since = timezone.now()
+        overlap = datetime.timedelta(seconds=settings.TASKS_SYNC_OVERLAP_SECONDS)
+        edges = {
+            'before_overlap': since - overlap - datetime.timedelta(seconds=1),
+            'at_overlap_edge': since - overlap,
+            'inside_overlap': since - overlap + datetime.timedelta(milliseconds=1),
+            'at_since': since,
+        }
+        for title, updated_at in edges.items():
+            task = self.create_task(title=title)
+            Task.objects.filter(pk=task.pk).update(updated_at=updated_at)
+
+        with mock.patch('django.utils.timezone.now', return_value=since + datetime.timedelta(seconds=1)):
+            payload = self.sync(since.isoformat())
+        self.assertEqual(
+            sorted(row['title'] for row in payload['tasks']), ['at_since', 'inside_overlap']
+        )
+
+    def test_cursor_older_than_tombstone_retention_forces_full_resync(self):
+        task = self.create_task()
+        retention = datetime.timedelta(days=settings.TASKS_SYNC_TOMBSTONE_RETENTION_DAYS)
+        stale = timezone.now() - retention - datetime.timedelta(minutes=1)
+        Tombstone.objects.create(user=self.user, kind='task', object_id=task.pk)
+
+        payload = self.sync(stale.isoformat())
+        self.assertTrue(payload['full'])
+        self.assertEqual(payload['deleted'], {'tasks': [], 'priorities': [], 'recurrences': []})
+        self.assertEqual([row['id'] for row in payload['tasks']], [str(task.pk)])
+
+    def test_invalid_since(self):
+        for since in ('вчера', '2024-01-01T00:00:00'):
+            response = self.client.get(self.url, {'since': since})
+            self.assertEqual(response.status_code, 400, since)
+
+
+
+class GenerateDescriptionRequestTests(ApiTestMixin, TestCase):
+    """Генерация описания: тело запроса, которое не является JSON объектом"""
+    bodies = ('[]', '"текст"', '{"title": 5}')
+
+    def test_sync_view_rejects_non_object_body(self):
+        for body in self.bodies:
+            response = self.client.post(
+                '/api/tasks/tasks/generate_description/', body, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_async_view_rejects_non_object_body(self):
+        for body in self.bodies:
+            request = RequestFactory().post(
+                '/api/tasks/tasks/generate_description/', body, content_type='application/json',
+                HTTP_AUTHORIZATION=self.client.defaults['HTTP_AUTHORIZATION'],
+            )
+            response = async_to_sync(async_views.generate_description)(request)
+            self.assertEqual(response.status_code, 400, body)
+
+
+
+class TaskSearchTestMixin(ApiTestMixin):
+    """Полнотекстовый поиск: одинаковое поведение на PostgreSQL и SQLite"""
+    url = '/api/tasks/tasks/search/'
+
+    def search(self, text, **params):
+        response = self.client.get(self.url, {'q': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, text):
+        return [row['title'] for row in self.search(text)['results']]
+
+    def test_title_matches_rank_above_description(self):
+        self.create_task(title='Позвонить бухгалтеру', description='Уточнить детали отчета')
+        self.create_task(title='Подготовить отчет', description='Квартальный')
+        self.assertEqual(self.titles('отчет'), ['Подготовить отчет', 'Позвонить бухгалтеру'])
+
+    def test_word_forms_match(self):
+        self.create_task(title='Сдать отчеты')
+        self.assertEqual(self.titles('отчет'), ['Сдать отчеты'])
+
+    def test_other_users_tasks_are_not_found(self):
+        other = User.objects.create(username='search_other')
+        Task.objects.create(user=other, title='Чужой отчет', date=datetime.date(2024, 1, 1),
+                            time=datetime.time(9, 0))
+        self.assertEqual(self.titles('отчет'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        task = self.create_task(title='Купить молоко')
+        task.title = 'Купить хлеб'
+        task.save()
+        self.assertEqual(self.titles('молоко'), [])
+        self.assertEqual(self.titles('хлеб'), ['Купить хлеб'])
+        task.delete()
+        self.assertEqual(self.titles('хлеб'), [])
+
+    def test_bulk_operations_are_indexed(self):
+        task = self.create_task(title='Старое название')
+        self.client.post('/api/tasks/tasks/bulk/', {'operations': [
+            {'op': 'create', 'data': {'title': 'Полить цветы', 'date': '2024-01-01', 'time': '09:00'}},
+            {'op': 'update', 'id': str(task.pk), 'data': {'description': 'Про цветы'}},
+        ]}, content_type='application/json')
+        self.assertEqual(self.titles('цветы'), ['Полить цветы', 'Старое название'])
+
+    def test_pagination(self):
+        for i in range(3):
+            self.create_task(title=f'Отчет {i}', time=datetime.time(9 + i, 0))
+        first = self.search('отчет', limit=2)
+        self.assertEqual(len(first['results']), 2)
+        self.assertIsNotNone(first['next'])
+        self.assertEqual(len(self.search('отчет', limit=2, offset=2)['results']), 1)
+
+    def test_language_change_reindexes_tasks(self):
+        self.create_task(title='Сдать отчеты')
+        profile = UserProfile.objects.get(user=self.user)
+        profile.language = 'en'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(self.titles('отчеты'), ['Сдать отчеты'])
+
+    def test_rebuild_command_restores_index(self):
+        self.create_task(title='Забытый отчет')
+        self.clear_index()
+        self.assertEqual(self.titles('отчет'), [])
+        call_command('rebuild_task_search', stdout=StringIO())
+        self.assertEqual(self.titles('отчет'), ['Забытый отчет'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 используется только на SQLite')
+class SQLiteTaskSearchTests(TaskSearchTestMixin, TestCase):
+
+    def clear_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {task_search.FTS_TABLE}')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'tsvector и GIN индекс есть только на PostgreSQL')
+class PostgresTaskSearchTests(TaskSearchTestMixin, TestCase):
+
+    def clear_index(self):
+        # Триггер срабатывает только при изменении title/description/user_id
+        Task.objects.update(search_vector=None)
+
+    def test_search_uses_gin_index(self):
+        self.create_task(title='Подготовить отчет')
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            cursor.execute(
+                "EXPLAIN SELECT id FROM tasks_task "
+                "WHERE search_vector @@ websearch_to_tsquery('russian', %s)",
+                ['отчет']
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('task_search_vector_idx', plan)
+
+
+
+class PriorityValidationTests(ApiTestMixin, TestCase):
+    """Проверка приоритета задачи по кэшу пользовательских приоритетов"""
+
+    def create(self, priority):
+        return self.client.post('/api/tasks/tasks/', {
+            'title': 'Задача', 'date': '2024-01-01', 'time': '09:00', 'priority': priority,
+        }, content_type='application/json')
+
+    def test_priority_created_in_another_process_is_accepted(self):
+        # Отказ заполняет кэш приоритетов пользователя
+        self.assertEqual(self.create('work').status_code, 400)
+        # bulk_create не отправляет сигналы — как создание приоритета другим воркером
+        CustomPriority.objects.bulk_create([
+            CustomPriority(user=self.user, name='work', display_name='Работа')
+        ])
+        self.assertEqual(self.create('work').status_code, 201)
+
+    def test_unknown_priority_is_rejected(self):
+        response = self.create('missing')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('priority', response.json())
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import TaskViewSet, CustomPriorityViewSet
 
@@ -5,4 +7,12 @@ router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'priorities', CustomPriorityViewSet, basename='priority')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+if settings.ASYNC_AI_VIEWS:
+    from . import async_views
+
+    # Маршрут раньше роутера: под ASGI генерация описания не занимает поток
+    urlpatterns = [
+        path('tasks/generate_description/', async_views.generate_description),
+    ] + urlpatterns
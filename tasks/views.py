@@ -1,14 +1,31 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import Http404
+from collections import defaultdict
 from datetime import datetime, timedelta
+import uuid
 
-from .models import Task, CustomPriority
-from .serializers import TaskSerializer, TaskCompletionSerializer, CustomPrioritySerializer
+from backend.conditional import conditional_list
+from chat import jobs
+from chat.ai_service import is_error_response
+from users import quota
+from . import description_cache, recurrence, search as task_search
+from .models import Task, CustomPriority, Tombstone, TaskRecurrence
+from .serializers import (
+    TaskSerializer, TaskCompletionSerializer, CustomPrioritySerializer, TaskRecurrenceSerializer,
+    TaskBulkOperationSerializer, task_values_serializer
+)
 from .ai_task_service import task_ai_service
+from .pagination import TaskCursorPagination
 
 
 class TaskViewSet(viewsets.ModelViewSet):
@@ -17,73 +34,559 @@ class TaskViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['completed', 'priority', 'date']
+    pagination_class = TaskCursorPagination
     
     def get_queryset(self):
         """Возвращаем только задачи текущего пользователя"""
         return Task.objects.filter(user=self.request.user)
     
+    def get_collection_version(self):
+        """Версия списка задач пользователя для ETag (один агрегатный запрос по индексу)"""
+        version = self.get_queryset().aggregate(
+            last_updated=Max('updated_at'), count=Count('id')
+        )
+        # Для today/week/month период зависит от текущей даты, а не от URL
+        period = self._period(self.action)
+        if period:
+            version['period'] = period
+        return version
+    
+    @staticmethod
+    def _period(name):
+        """Период (start, end) для today/week/month относительно текущей даты"""
+        today = timezone.now().date()
+        if name == 'today':
+            return today, today
+        if name == 'week':
+            week_start = today - timedelta(days=today.weekday())
+            return week_start, week_start + timedelta(days=6)
+        if name == 'month':
+            month_start = today.replace(day=1)
+            next_month = month_start.replace(month=month_start.month + 1) if month_start.month < 12 else month_start.replace(year=month_start.year + 1, month=1)
+            return month_start, next_month - timedelta(days=1)
+        return None
+    
+    @conditional_list
+    def list(self, request, *args, **kwargs):
+        tasks = self.filter_queryset(self.get_queryset())
+        # Фильтр по дню — запрос за период: добавляем повторения задач
+        occurrences = []
+        day = self._parse_date(request.query_params.get('date'))
+        if day:
+            occurrences = self._filter_occurrences(
+                recurrence.expand(request.user, day, day, task_values_serializer), request.query_params
+            )
+        return self._list_response(tasks, occurrences)
+    
+    def _list_response(self, tasks, occurrences=None):
+        """
+        Ответ со списком задач (постранично, если клиент передал cursor/page_size).
+
+        Строки читаются через `.values()` и сериализуются быстрым путем без
+        создания экземпляров Task; JSON совпадает с TaskSerializer.
+        Вычисленные повторения вливаются в выдачу по ключу сортировки.
+        """
+        rows = task_values_serializer.values(tasks)
+        if occurrences:
+            page = self.paginator.paginate_queryset(rows, self.request, view=self, extra_rows=occurrences)
+            if page is None:
+                rows = self.paginator.merge_rows(rows.order_by(*self.paginator.ordering), occurrences)
+        else:
+            page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(task_values_serializer.serialize(page))
+        return Response(task_values_serializer.serialize(rows))
+    
+    def _range_response(self, start, end):
+        """Задачи за период вместе с повторениями, которые не хранятся в БД"""
+        tasks = self.get_queryset().filter(date__range=[start, end])
+        occurrences = recurrence.expand(self.request.user, start, end, task_values_serializer)
+        return self._list_response(tasks, occurrences)
+    
+    @staticmethod
+    def _parse_date(value):
+        if not isinstance(value, str):
+            return None
+        try:
+            return parse_date(value)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _filter_occurrences(occurrences, params):
+        """Фильтры списка для вычисленных повторений (они всегда не выполнены)"""
+        if params.get('completed', '').lower() in ('true', '1'):
+            return []
+        priority = params.get('priority')
+        if priority:
+            return [row for row in occurrences if row['priority'] == priority]
+        return occurrences
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Удаленное материализованное повторение не должно вернуться при раскрытии правила
+            if instance.recurrence_parent_id:
+                recurrence.exclude_dates({instance.recurrence_parent_id: [instance.occurrence_date]})
+            instance.delete()
+    
     @action(detail=True, methods=['patch'])
     def complete(self, request, pk=None):
         """Отметить задачу как выполненную"""
-        task = self.get_object()
-        serializer = TaskCompletionSerializer(task, data={'completed': True}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self._set_completed(request, pk, True)
     
     @action(detail=True, methods=['patch'])
     def uncomplete(self, request, pk=None):
         """Отменить выполнение задачи"""
-        task = self.get_object()
-        serializer = TaskCompletionSerializer(task, data={'completed': False}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+        return self._set_completed(request, pk, False)
+    
+    def _set_completed(self, request, pk, completed):
+        """
+        Выполнение задачи. Вычисленное повторение (его id нет в БД)
+        материализуется, если клиент передал recurrence_parent и
+        occurrence_date из строки повторения.
+        """
+        with transaction.atomic():
+            try:
+                task = self.get_object()
+            except Http404:
+                task = self._materialize_from_request(request, pk)
+                if task is None:
+                    return Response(
+                        {'error': 'Задача не найдена. Для повторения, которое еще не сохранено, '
+                                  'передайте recurrence_parent и occurrence_date или используйте '
+                                  'POST /tasks/{recurrence_parent}/occurrence/'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+            serializer = TaskCompletionSerializer(task, data={'completed': completed}, partial=True)
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    def _materialize_from_request(self, request, pk):
+        """Материализовать повторение pk по recurrence_parent и occurrence_date из тела запроса"""
+        if not isinstance(request.data, dict):
+            return None
+        day = self._parse_date(request.data.get('occurrence_date'))
+        try:
+            parent_id = uuid.UUID(str(request.data.get('recurrence_parent')))
+        except ValueError:
+            return None
+        if not day or str(recurrence.occurrence_id(parent_id, day)) != str(pk):
+            return None
+        template = self.get_queryset().filter(pk=parent_id).first()
+        rule = TaskRecurrence.objects.filter(task_id=parent_id).first()
+        if template is None or rule is None or not recurrence.is_occurrence(rule, template.date, day):
+            return None
+        task, _ = self._materialize_occurrence(template, day)
+        return task
+    
     @action(detail=False, methods=['get'])
+    @conditional_list
     def today(self, request):
         """Получить задачи на сегодня"""
-        today = timezone.now().date()
-        tasks = self.get_queryset().filter(date=today)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._range_response(*self._period('today'))
     
     @action(detail=False, methods=['get'])
+    @conditional_list
     def week(self, request):
         """Получить задачи на текущую неделю"""
-        today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        tasks = self.get_queryset().filter(date__range=[week_start, week_end])
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._range_response(*self._period('week'))
     
     @action(detail=False, methods=['get'])
+    @conditional_list
     def month(self, request):
         """Получить задачи на текущий месяц"""
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-        next_month = month_start.replace(month=month_start.month + 1) if month_start.month < 12 else month_start.replace(year=month_start.year + 1, month=1)
-        month_end = next_month - timedelta(days=1)
-        
-        tasks = self.get_queryset().filter(date__range=[month_start, month_end])
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._range_response(*self._period('month'))
     
     @action(detail=False, methods=['get'])
+    @conditional_list
     def completed(self, request):
         """Получить завершенные задачи"""
         tasks = self.get_queryset().filter(completed=True)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._list_response(tasks)
+    
+    @action(detail=False, methods=['get'])
+    @conditional_list
+    def calendar(self, request):
+        """Количество задач по дням за период (для точек и счетчиков календаря)"""
+        try:
+            start = parse_date(request.query_params.get('start', ''))
+            end = parse_date(request.query_params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if not start or not end:
+            return Response(
+                {'error': 'Параметры start и end обязательны в формате YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end < start:
+            return Response(
+                {'error': 'Дата end не может быть раньше start'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_days = settings.TASKS_CALENDAR_MAX_DAYS
+        if (end - start).days >= max_days:
+            return Response(
+                {'error': f'Период не может превышать {max_days} дней'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        by_priority = request.query_params.get('by_priority') in ('1', 'true')
+        group_by = ['date', 'priority'] if by_priority else ['date']
+        rows = (
+            self.get_queryset()
+            .filter(date__range=[start, end])
+            .values(*group_by)
+            .annotate(total=Count('id'), completed=Count('id', filter=Q(completed=True)))
+            .order_by(*group_by)
+        )
+        
+        days = {}
+        for row in rows:
+            day = days.setdefault(row['date'], {'date': row['date'], 'total': 0, 'completed': 0})
+            day['total'] += row['total']
+            day['completed'] += row['completed']
+            if by_priority:
+                day.setdefault('priorities', {})[row['priority']] = row['total']
+        
+        # Повторения задач вычисляются, а не хранятся; все они не выполнены
+        for row in recurrence.expand(request.user, start, end, task_values_serializer):
+            day = days.setdefault(row['date'], {'date': row['date'], 'total': 0, 'completed': 0})
+            day['total'] += 1
+            if by_priority:
+                priorities = day.setdefault('priorities', {})
+                priorities[row['priority']] = priorities.get(row['priority'], 0) + 1
+        
+        return Response({
+            'start': start,
+            'end': end,
+            'days': sorted(days.values(), key=lambda day: day['date']),
+        })
+    
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path='recurrence')
+    def recurrence_rule(self, request, pk=None):
+        """Правило повторения задачи: получить, задать или удалить"""
+        task = self.get_object()
+        rule = TaskRecurrence.objects.filter(task=task).first()
+        
+        if request.method == 'GET':
+            if rule is None:
+                return Response(
+                    {'error': 'Правило повторения не задано'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(TaskRecurrenceSerializer(rule).data)
+        
+        if request.method == 'DELETE':
+            with transaction.atomic():
+                if rule is not None:
+                    rule.delete()
+                self._touch(task)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        if task.recurrence_parent_id:
+            return Response(
+                {'error': 'Повторение задачи не может иметь собственное правило'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = TaskRecurrenceSerializer(rule, data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            serializer.save(task=task, user=request.user)
+            self._touch(task)
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if rule is not None else status.HTTP_201_CREATED
+        )
+    
+    @action(detail=True, methods=['post', 'delete'])
+    def occurrence(self, request, pk=None):
+        """
+        Изменить или удалить одно повторение задачи.
+        
+        POST {"occurrence_date": "YYYY-MM-DD", ...поля задачи} материализует
+        повторение (создает строку Task с тем же id, что у вычисленного) и
+        применяет изменения. DELETE ?occurrence_date=YYYY-MM-DD исключает дату.
+        """
+        template = self.get_object()
+        source = request.data if request.method == 'POST' else request.query_params
+        day = self._parse_date(source.get('occurrence_date')) if isinstance(source, dict) else None
+        if not day:
+            return Response(
+                {'error': 'Параметр occurrence_date обязателен в формате YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rule = TaskRecurrence.objects.filter(task=template).first()
+        if rule is None or not recurrence.is_occurrence(rule, template.date, day):
+            return Response(
+                {'error': 'Повторение задачи на эту дату не найдено'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if request.method == 'DELETE':
+            with transaction.atomic():
+                recurrence.exclude_dates({template.pk: [day]})
+                Task.objects.filter(recurrence_parent=template, occurrence_date=day).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        changes = {key: value for key, value in request.data.items() if key != 'occurrence_date'}
+        with transaction.atomic():
+            task, created = self._materialize_occurrence(template, day)
+            serializer = self.get_serializer(task, data=changes, partial=True)
+            if not serializer.is_valid():
+                transaction.set_rollback(True)
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save()
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @staticmethod
+    def _materialize_occurrence(template, day):
+        """Строка Task для повторения (id совпадает с вычисленным, повторный вызов ее же и вернет)"""
+        return Task.objects.get_or_create(
+            id=recurrence.occurrence_id(template.pk, day),
+            defaults={
+                'user': template.user,
+                'title': template.title,
+                'description': template.description,
+                'time': template.time,
+                'date': day,
+                'priority': template.priority,
+                'recurrence_parent': template,
+                'occurrence_date': day,
+            },
+        )
+    
+    @staticmethod
+    def _touch(task):
+        """Обновить updated_at шаблона: от него зависят ETag списков и синхронизация"""
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now())
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Полнотекстовый поиск по названию и описанию задач (по релевантности)"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {'error': 'Параметр q обязателен'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', settings.TASKS_PAGE_SIZE))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response(
+                {'error': 'Параметры limit и offset должны быть числами'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(max(limit, 1), settings.TASKS_MAX_PAGE_SIZE)
+        offset = max(offset, 0)
+        
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        task_ids = task_search.search_task_ids(request.user, text, limit + 1, offset)
+        has_next = len(task_ids) > limit
+        task_ids = task_ids[:limit]
+        
+        rows = {
+            row['id']: row
+            for row in task_values_serializer.values(self.get_queryset().filter(id__in=task_ids))
+        }
+        results = task_values_serializer.serialize(
+            rows[task_id] for task_id in task_ids if task_id in rows
+        )
+        
+        next_url = None
+        if has_next:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+        return Response({'next': next_url, 'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Дельта-синхронизация: задачи, приоритеты и правила повторения, измененные после курсора, и удаления"""
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None or timezone.is_naive(since):
+                return Response(
+                    {'error': 'Параметр since должен быть курсором из предыдущего ответа'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        now = timezone.now()
+        retention = timedelta(days=settings.TASKS_SYNC_TOMBSTONE_RETENTION_DAYS)
+        # Без курсора или со слишком старым курсором (отметки об удалении уже очищены)
+        # отдаем полный снимок, и клиент пересобирает локальную копию
+        full = since is None or since < now - retention
+        
+        tasks = self.get_queryset()
+        priorities = CustomPriority.objects.filter(user=request.user)
+        # Правила повторения (с исключенными датами): без них клиент не раскроет повторения
+        recurrences = TaskRecurrence.objects.filter(user=request.user)
+        deleted = {'tasks': [], 'priorities': [], 'recurrences': []}
+        if not full:
+            # Перекрытие окна: строки из транзакций, закоммиченных после прошлого ответа,
+            # но с более ранним updated_at, не теряются (клиент применяет их идемпотентно)
+            changed_since = since - timedelta(seconds=settings.TASKS_SYNC_OVERLAP_SECONDS)
+            tasks = tasks.filter(updated_at__gt=changed_since)
+            priorities = priorities.filter(updated_at__gt=changed_since)
+            recurrences = recurrences.filter(updated_at__gt=changed_since)
+            tombstones = Tombstone.objects.filter(user=request.user, deleted_at__gt=changed_since)
+            deleted_keys = {'task': 'tasks', 'priority': 'priorities', 'recurrence': 'recurrences'}
+            for kind, object_id in tombstones.values_list('kind', 'object_id'):
+                deleted[deleted_keys[kind]].append(object_id)
+        
+        return Response({
+            'cursor': now,
+            'full': full,
+            'tasks': task_values_serializer.serialize(task_values_serializer.values(tasks)),
+            'priorities': CustomPrioritySerializer(priorities, many=True).data,
+            'recurrences': TaskRecurrenceSerializer(recurrences, many=True).data,
+            'deleted': deleted,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Пакетное создание/изменение/выполнение/удаление задач в одной транзакции"""
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {'error': 'Передайте непустой список operations'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_operations = settings.TASKS_BULK_MAX_OPERATIONS
+        if len(operations) > max_operations:
+            return Response(
+                {'error': f'Не более {max_operations} операций за один запрос'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        operations_serializer = TaskBulkOperationSerializer(data=operations, many=True)
+        if not operations_serializer.is_valid():
+            return Response({'operations': operations_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        operations = operations_serializer.validated_data
+        
+        # Пакет применяется целиком или не применяется вовсе. Затронутые задачи
+        # загружаем одним запросом и блокируем до конца транзакции, чтобы
+        # параллельный запрос не изменил их между проверкой и записью
+        with transaction.atomic():
+            tasks = self.get_queryset().select_for_update().in_bulk(
+                [op['id'] for op in operations if 'id' in op]
+            )
+            validated, errors = self._validate_bulk_operations(operations, tasks)
+            if any(errors):
+                return Response({
+                    'results': [
+                        {'index': index, 'op': op['op'], 'status': 'error', 'errors': error}
+                        if error else
+                        {'index': index, 'op': op['op'], 'status': 'valid'}
+                        for index, (op, error) in enumerate(zip(operations, errors))
+                    ]
+                }, status=status.HTTP_400_BAD_REQUEST)
+            results = self._apply_bulk_operations(operations, validated, tasks)
+        return Response({'results': results})
+    
+    def _validate_bulk_operations(self, operations, tasks):
+        """Проверка операций пакета: данные для записи и ошибки по индексам операций"""
+        validated = [None] * len(operations)
+        errors = [None] * len(operations)
+        seen_ids = set()
+        for index, op in enumerate(operations):
+            task_id = op.get('id')
+            if task_id is not None:
+                if task_id in seen_ids:
+                    errors[index] = {'id': ['Задача уже изменяется другой операцией в этом пакете']}
+                    continue
+                seen_ids.add(task_id)
+                if task_id not in tasks:
+                    errors[index] = {'id': ['Задача не найдена']}
+                    continue
+            if op['op'] in ('create', 'update'):
+                serializer = self.get_serializer(
+                    tasks.get(task_id), data=op['data'], partial=op['op'] == 'update'
+                )
+                if serializer.is_valid():
+                    validated[index] = serializer.validated_data
+                else:
+                    errors[index] = serializer.errors
+        return validated, errors
+    
+    def _apply_bulk_operations(self, operations, validated, tasks):
+        """Применение проверенных операций: bulk_create, bulk_update и UPDATE/DELETE по списку id"""
+        now = timezone.now()
+        to_create = []
+        # bulk_update пишет перечисленные поля у всех задач, поэтому группируем
+        # задачи по набору измененных полей: неизмененные поля не перезаписываются
+        to_update = defaultdict(list)
+        ids_by_op = defaultdict(list)
+        changed = {}
+        
+        for index, op in enumerate(operations):
+            if op['op'] == 'create':
+                task = Task(user=self.request.user, **validated[index])
+                to_create.append(task)
+                changed[index] = task
+            elif op['op'] == 'update':
+                task = tasks[op['id']]
+                for attr, value in validated[index].items():
+                    setattr(task, attr, value)
+                # bulk_update не обновляет auto_now поля сам
+                task.updated_at = now
+                to_update[frozenset(validated[index]) | {'updated_at'}].append(task)
+                changed[index] = task
+            else:
+                ids_by_op[op['op']].append(op['id'])
+        
+        if to_create:
+            Task.objects.bulk_create(to_create)
+        for fields, group in to_update.items():
+            Task.objects.bulk_update(group, sorted(fields))
+        # bulk_create/bulk_update не отправляют post_save
+        task_search.index_tasks(to_create + [task for group in to_update.values() for task in group])
+        queryset = self.get_queryset()
+        if ids_by_op['complete']:
+            queryset.filter(id__in=ids_by_op['complete']).update(completed=True, updated_at=now)
+        if ids_by_op['uncomplete']:
+            queryset.filter(id__in=ids_by_op['uncomplete']).update(completed=False, updated_at=now)
+        if ids_by_op['delete']:
+            # Удаленные материализованные повторения исключаем из раскрытия правил
+            excluded = defaultdict(list)
+            for task_id in ids_by_op['delete']:
+                task = tasks[task_id]
+                if task.recurrence_parent_id:
+                    excluded[task.recurrence_parent_id].append(task.occurrence_date)
+            recurrence.exclude_dates(excluded)
+            queryset.filter(id__in=ids_by_op['delete']).delete()
+        
+        results = []
+        for index, op in enumerate(operations):
+            result = {'index': index, 'op': op['op'], 'status': 'ok'}
+            if index in changed:
+                result['task'] = self.get_serializer(changed[index]).data
+            else:
+                result['id'] = op['id']
+            results.append(result)
+        return results
     
     @action(detail=False, methods=['post'])
     def generate_description(self, request):
-        """Генерация описания задачи с помощью AI"""
-        title = request.data.get('title', '').strip()
+        """
+        Генерация описания задачи с помощью AI.
+        С ?background=1 задача ставится в очередь AI воркера (ответ 202).
+        """
+        if not isinstance(request.data, dict):
+            return Response(
+                {'error': 'Тело запроса должно быть JSON объектом'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        title = request.data.get('title')
+        title = title.strip() if isinstance(title, str) else ''
         language = request.data.get('language', 'ru')
         
         if not title:
@@ -93,7 +596,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Проверяем лимиты AI использования
+            # Проверяем и списываем лимит AI использования
             profile = getattr(request.user, 'profile', None)
             if not profile:
                 return Response(
@@ -101,22 +604,29 @@ class TaskViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if profile.ai_descriptions_used >= profile.ai_descriptions_limit:
+            if not quota.reserve(profile, quota.DESCRIPTIONS):
                 return Response(
                     {'error': f'Превышен лимит AI описаний: {profile.ai_descriptions_limit}'},
                     status=status.HTTP_429_TOO_MANY_REQUESTS
                 )
             
-            # Генерируем описание
-            description = task_ai_service.generate_task_description(
-                user_profile=profile,
-                task_title=title,
-                language=language
-            )
+            if jobs.wants_background(request):
+                # Описание сформирует AI воркер; клиент опрашивает chat/jobs/{id}/
+                data = jobs.enqueue_task_description(request.user.id, title, language)
+                return Response(data, status=status.HTTP_202_ACCEPTED)
             
-            # Увеличиваем счетчик использования
-            profile.ai_descriptions_used += 1
-            profile.save()
+            # Генерируем описание
+            try:
+                description = task_ai_service.generate_task_description(
+                    user_profile=profile,
+                    task_title=title,
+                    language=language
+                )
+            except Exception:
+                quota.refund(profile, quota.DESCRIPTIONS)
+                raise
+            if is_error_response(description):
+                quota.refund(profile, quota.DESCRIPTIONS)
             
             return Response({
                 'description': description,
@@ -128,6 +638,11 @@ class TaskViewSet(viewsets.ModelViewSet):
                 {'error': f'Ошибка генерации описания: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def description_cache_stats(self, request):
+        """Попадания и промахи кэша AI описаний (для администраторов)"""
+        return Response(description_cache.stats())
 
 
 class CustomPriorityViewSet(viewsets.ModelViewSet):
@@ -138,3 +653,13 @@ class CustomPriorityViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Возвращаем только приоритеты текущего пользователя"""
         return CustomPriority.objects.filter(user=self.request.user)
+    
+    def get_collection_version(self):
+        """Версия списка приоритетов пользователя для ETag"""
+        return self.get_queryset().aggregate(
+            last_updated=Max('updated_at'), count=Count('id')
+        )
+    
+    @conditional_list
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
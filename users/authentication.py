@@ -0,0 +1,60 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def _token_cache_key(key):
+    # В ключ кэша токен попадает только в виде хеша
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем: токен вместе с пользователем и его профилем
+    хранится в кэше AUTH_TOKEN_CACHE_TIMEOUT секунд, поэтому запрос с
+    теплым кэшем не обращается к БД ни для аутентификации, ни за
+    `request.user.profile`. Запись сбрасывается при удалении токена и
+    сохранении пользователя или профиля (см. `invalidate_user`).
+
+    При AUTH_TOKEN_CACHE_TIMEOUT = 0 (по умолчанию для локального кэша
+    процесса, который не видит сброс из других процессов) токен каждый раз
+    читается из БД одним запросом вместе с профилем.
+    """
+
+    def authenticate_credentials(self, key):
+        timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+        cache_key = _token_cache_key(key)
+        token = cache.get(cache_key) if timeout > 0 else None
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user__profile').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if timeout > 0:
+                cache.set_many({cache_key: token, _user_cache_key(token.user_id): key}, timeout)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+def invalidate_token(key, user_id):
+    """Сбросить кэш токена (токен удален)"""
+    cache.delete_many([_token_cache_key(key), _user_cache_key(user_id)])
+
+
+def invalidate_user(user_id):
+    """Сбросить кэш токена пользователя (изменились пользователь или профиль)"""
+    key = cache.get(_user_cache_key(user_id))
+    if key is not None:
+        invalidate_token(key, user_id)
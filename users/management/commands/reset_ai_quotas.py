@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users import quota
+
+
+class Command(BaseCommand):
+    help = (
+        'Сбрасывает суточные счетчики AI у профилей, не сброшенных сегодня '
+        '(пакетными UPDATE по диапазонам id; запускать по расписанию после полуночи)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Профилей в одном UPDATE')
+
+    def handle(self, *args, **options):
+        count = quota.reset_stale(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Сброшено профилей: {count}'))
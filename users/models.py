@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 
 
 class UserProfile(models.Model):
@@ -28,6 +29,10 @@ class UserProfile(models.Model):
         ('pro', 'Pro'),
     ]
     
+    # Лимиты AI по планам (используются и в SQL, см. users.quota)
+    AI_DESCRIPTIONS_LIMITS = {'free': 3, 'plus': 10, 'pro': 20}
+    AI_CHAT_REQUESTS_LIMITS = {'free': 3, 'plus': 20, 'pro': 100}
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile", verbose_name="Пользователь")
     language = models.CharField(max_length=2, choices=LANGUAGE_CHOICES, default='ru', verbose_name="Язык")
     theme = models.CharField(max_length=5, choices=THEME_CHOICES, default='light', verbose_name="Тема")
@@ -50,17 +55,69 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Профиль {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения из БД для отслеживания измененных полей
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if hasattr(self, '_loaded_values'):
+            self._remember_values(fields)
+    
+    def _remember_values(self, fields=None):
+        if fields is None:
+            # Все загруженные поля (отложенные не читаем)
+            fields = [field.attname for field in self._meta.concrete_fields if field.attname in self.__dict__]
+        loaded = getattr(self, '_loaded_values', {})
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            loaded[attname] = getattr(self, attname)
+        self._loaded_values = loaded
+    
+    def get_dirty_fields(self):
+        """Поля, измененные после загрузки из БД; None — исходные значения неизвестны"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            if field.attname in loaded:
+                if getattr(self, field.attname) != loaded[field.attname]:
+                    dirty.append(field.name)
+            elif field.attname in self.__dict__:
+                # Отложенное (only/defer) поле, которому присвоили значение
+                dirty.append(field.name)
+        return dirty
+    
+    def save(self, *args, **kwargs):
+        """
+        Записывает только измененные поля (и updated_at), а сохранение без
+        изменений пропускает целиком — без UPDATE и сигналов.
+        """
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert') and not kwargs.get('force_update'):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                kwargs['update_fields'] = [*dirty, 'updated_at']
+        super().save(*args, **kwargs)
+        self._remember_values(kwargs.get('update_fields'))
+    
     @property
     def ai_descriptions_limit(self):
         """Лимит AI описаний в зависимости от плана"""
-        limits = {'free': 3, 'plus': 10, 'pro': 20}
-        return limits.get(self.plan, 3)
+        return self.AI_DESCRIPTIONS_LIMITS.get(self.plan, self.AI_DESCRIPTIONS_LIMITS['free'])
     
     @property
     def ai_chat_requests_limit(self):
         """Лимит AI чат запросов в зависимости от плана"""  
-        limits = {'free': 3, 'plus': 20, 'pro': 100}
-        return limits.get(self.plan, 3)
+        return self.AI_CHAT_REQUESTS_LIMITS.get(self.plan, self.AI_CHAT_REQUESTS_LIMITS['free'])
 
 
 @receiver(post_save, sender=User)
@@ -71,7 +128,27 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User) 
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created, **kwargs):
     """Автоматическое сохранение профиля при сохранении пользователя"""
-    if hasattr(instance, 'profile'):
+    # Только что созданный профиль сохранять повторно незачем; не загруженный
+    # вместе с пользователем профиль не менялся — не читаем его из БД
+    if not created and User.profile.related.is_cached(instance) and hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def invalidate_cached_token_on_save(sender, instance, **kwargs):
+    """Кэш аутентификации хранит пользователя с профилем — сбрасываем при изменении"""
+    from .authentication import invalidate_user
+    invalidate_user(instance.pk if sender is User else instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token_on_delete(sender, instance, **kwargs):
+    """Удаленный токен больше не должен аутентифицировать из кэша"""
+    from .authentication import invalidate_token
+    from .telegram import forget_user
+    invalidate_token(instance.key, instance.user_id)
+    # Кэш initData -> токен тоже не должен выдавать удаленный токен
+    forget_user(instance.user_id)
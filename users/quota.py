@@ -0,0 +1,114 @@
+"""
+Учет AI лимитов пользователя.
+
+Проверка лимита и списание выполняются одним условным UPDATE
+(`used = used + 1 WHERE used < лимит плана`): параллельные запросы не
+могут превысить лимит, а строка профиля не перезаписывается целиком.
+Если запрос к провайдеру не удался, использование возвращается `refund()`.
+
+Лимиты суточные. Профиль, у которого `ai_usage_last_reset` раньше
+сегодняшнего дня, сбрасывается в том же UPDATE при первом списании;
+`manage.py reset_ai_quotas` сбрасывает все такие профили пакетами.
+"""
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from django.utils import timezone
+
+from .authentication import invalidate_user
+from .models import UserProfile
+
+DESCRIPTIONS = 'descriptions'
+CHAT_REQUESTS = 'chat_requests'
+
+_LIMITS = {
+    DESCRIPTIONS: UserProfile.AI_DESCRIPTIONS_LIMITS,
+    CHAT_REQUESTS: UserProfile.AI_CHAT_REQUESTS_LIMITS,
+}
+
+
+USED_FIELDS = {kind: f'ai_{kind}_used' for kind in _LIMITS}
+
+
+def _used_field(kind):
+    return USED_FIELDS[kind]
+
+
+def _stale(today):
+    # Период сменился: счетчики относятся к прошлому дню
+    return Q(ai_usage_last_reset__lt=today)
+
+
+def is_stale(profile, today=None):
+    """Счетчики профиля еще не сброшены за сегодня"""
+    return profile.ai_usage_last_reset < (today or timezone.localdate())
+
+
+def plan_limit(kind):
+    """Лимит по плану профиля как SQL выражение (CASE plan ...)"""
+    limits = _LIMITS[kind]
+    return Case(
+        *(When(plan=plan, then=Value(limit)) for plan, limit in limits.items()),
+        default=Value(limits['free']),
+        output_field=IntegerField(),
+    )
+
+
+def profile_for(user):
+    """Профиль пользователя; создается, если его нет"""
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        return profile
+
+
+def reserve(profile, kind):
+    """
+    Списать одно использование, если лимит не исчерпан. Возвращает True
+    при успехе; счетчики в `profile` обновляются значениями из БД.
+
+    Если период сменился, счетчики сбрасываются в том же UPDATE (в SET
+    все выражения CASE видят значения строки до обновления).
+    """
+    field = _used_field(kind)
+    today = timezone.localdate()
+    stale = _stale(today)
+    counters = {
+        name: Case(
+            When(stale, then=Value(1 if name == field else 0)),
+            default=F(name) + 1 if name == field else F(name),
+        )
+        for name in USED_FIELDS.values()
+    }
+    reserved = UserProfile.objects.filter(
+        stale | Q(**{f'{field}__lt': plan_limit(kind)}), pk=profile.pk
+    ).update(ai_usage_last_reset=today, **counters)
+    # UPDATE без сигналов: кэшированный профиль в аутентификации устарел
+    invalidate_user(profile.user_id)
+    profile.refresh_from_db(fields=[*USED_FIELDS.values(), 'plan', 'ai_usage_last_reset'])
+    return bool(reserved)
+
+
+def refund(profile, kind):
+    """Вернуть использование (запрос к провайдеру не удался)"""
+    field = _used_field(kind)
+    UserProfile.objects.filter(pk=profile.pk, **{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+    invalidate_user(profile.user_id)
+    profile.refresh_from_db(fields=[field])
+
+
+def reset_stale(batch_size=10000, today=None):
+    """
+    Сбросить счетчики всех профилей с прошлым периодом. Один UPDATE на
+    диапазон первичных ключей длиной `batch_size`: короткие транзакции и
+    без загрузки профилей в Python. Возвращает число сброшенных профилей.
+    """
+    # Кэш аутентификации не сбрасываем: устаревшие счетчики в нем живут не
+    # дольше AUTH_TOKEN_CACHE_TIMEOUT, а списание проверяет лимит по БД
+    today = today or timezone.localdate()
+    last_pk = UserProfile.objects.aggregate(last=Max('pk'))['last'] or 0
+    reset = 0
+    for start in range(0, last_pk, batch_size):
+        reset += UserProfile.objects.filter(
+            _stale(today), pk__gt=start, pk__lte=start + batch_size
+        ).update(ai_usage_last_reset=today, **{name: 0 for name in USED_FIELDS.values()})
+    return reset
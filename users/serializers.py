@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from . import quota
 from .models import UserProfile
 
 
@@ -28,6 +29,14 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at', 'ai_descriptions_limit', 'ai_chat_requests_limit']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if quota.is_stale(instance):
+            # Период сменился, а счетчики еще не сброшены (сброс при первом списании)
+            for field in quota.USED_FIELDS.values():
+                data[field] = 0
+        return data
 
 
 class UserWithProfileSerializer(serializers.ModelSerializer):
@@ -2,8 +2,20 @@ import hashlib
 import hmac
 import json
 import time
+from functools import lru_cache
 from urllib.parse import parse_qsl
 
+from django.core.cache import cache
+
+# initData is accepted for 24 hours after auth_date
+INIT_DATA_MAX_AGE = 24 * 60 * 60
+
+
+@lru_cache(maxsize=4)
+def _secret_key(bot_token: str) -> bytes:
+    """HMAC secret derived from the bot token (computed once per process)."""
+    return hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+
 
 def verify_telegram_init_data(init_data: str, bot_token: str):
     """Verify Telegram WebApp initData string.
@@ -15,12 +27,11 @@ def verify_telegram_init_data(init_data: str, bot_token: str):
     if not hash_value:
         return None
     data_check = '\n'.join(f"{k}={v}" for k, v in sorted(data.items()))
-    secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
-    calculated_hash = hmac.new(secret_key, data_check.encode(), hashlib.sha256).hexdigest()
-    if calculated_hash != hash_value:
+    calculated_hash = hmac.new(_secret_key(bot_token), data_check.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(calculated_hash, hash_value):
         return None
     auth_date = int(data.get('auth_date', '0'))
-    if time.time() - auth_date > 24 * 60 * 60:
+    if time.time() - auth_date > INIT_DATA_MAX_AGE:
         return None
     if 'user' in data:
         try:
@@ -28,3 +39,42 @@ def verify_telegram_init_data(init_data: str, bot_token: str):
         except Exception:
             return None
     return data
+
+
+def _init_data_cache_key(init_data: str) -> str:
+    # Keyed by the whole signed string, so a hit implies it was verified before
+    return f'auth:telegram:{hashlib.sha256(init_data.encode()).hexdigest()}'
+
+
+def _user_token_cache_key(user_id) -> str:
+    return f'auth:telegram-user:{user_id}'
+
+
+def get_cached_token(init_data: str):
+    """Token key issued for this exact initData, if it was verified recently.
+
+    The entry is trusted only while the user's current token key is still
+    recorded (see `forget_user`), so a deleted token is never handed out.
+    """
+    entry = cache.get(_init_data_cache_key(init_data))
+    if entry is None:
+        return None
+    token_key, user_id = entry
+    if cache.get(_user_token_cache_key(user_id)) != token_key:
+        return None
+    return token_key
+
+
+def cache_token(init_data: str, auth_date: int, token_key: str, user_id: int, timeout: int):
+    """Remember the issued token until initData expires (at most `timeout` seconds, 0 disables)."""
+    timeout = min(int(auth_date + INIT_DATA_MAX_AGE - time.time()), timeout)
+    if timeout > 0:
+        cache.set_many({
+            _init_data_cache_key(init_data): (token_key, user_id),
+            _user_token_cache_key(user_id): token_key,
+        }, timeout)
+
+
+def forget_user(user_id):
+    """Invalidate every cached initData of the user (their token was deleted)."""
+    cache.delete(_user_token_cache_key(user_id))
@@ -1,3 +1,257 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import hmac
+import json
+import threading
+import time
+from unittest import mock, skipIf
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.contrib.auth.models import User, update_last_login
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import quota
+from .models import UserProfile
+
+
+class QuotaTests(TestCase):
+    """Списание и возврат AI лимитов"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='quota_user')
+        self.profile = self.user.profile
+
+    def test_reserve_until_plan_limit(self):
+        limit = self.profile.ai_descriptions_limit
+        results = [quota.reserve(self.profile, quota.DESCRIPTIONS) for _ in range(limit + 2)]
+        self.assertEqual(results, [True] * limit + [False, False])
+        self.assertEqual(self.profile.ai_descriptions_used, limit)
+
+    def test_limit_follows_plan(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(plan='pro', ai_chat_requests_used=50)
+        self.assertTrue(quota.reserve(self.profile, quota.CHAT_REQUESTS))
+        self.assertEqual(self.profile.ai_chat_requests_used, 51)
+
+    def test_refund_never_goes_negative(self):
+        quota.reserve(self.profile, quota.DESCRIPTIONS)
+        quota.refund(self.profile, quota.DESCRIPTIONS)
+        quota.refund(self.profile, quota.DESCRIPTIONS)
+        self.assertEqual(self.profile.ai_descriptions_used, 0)
+
+    def test_reserve_resets_previous_day(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        UserProfile.objects.filter(pk=self.profile.pk).update(
+            ai_usage_last_reset=yesterday, ai_descriptions_used=3, ai_chat_requests_used=3
+        )
+        self.assertTrue(quota.reserve(self.profile, quota.DESCRIPTIONS))
+        self.assertEqual(self.profile.ai_descriptions_used, 1)
+        self.assertEqual(self.profile.ai_chat_requests_used, 0)
+        self.assertEqual(self.profile.ai_usage_last_reset, timezone.localdate())
+
+    def test_reset_stale_in_batches(self):
+        others = User.objects.bulk_create(User(username=f'quota_bulk_{i}') for i in range(5))
+        UserProfile.objects.bulk_create(UserProfile(user=user) for user in others)
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        UserProfile.objects.update(ai_usage_last_reset=yesterday, ai_chat_requests_used=2)
+        UserProfile.objects.filter(pk=self.profile.pk).update(ai_usage_last_reset=timezone.localdate())
+
+        self.assertEqual(quota.reset_stale(batch_size=2), 5)
+        self.assertEqual(UserProfile.objects.filter(ai_chat_requests_used=0).count(), 5)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.ai_chat_requests_used, 2)
+
+    def test_reserve_writes_only_counter(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(theme='dark')
+        quota.reserve(self.profile, quota.CHAT_REQUESTS)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.theme, 'dark')
+
+
+class ProfileDirtyFieldsTests(TestCase):
+    """Профиль записывает только измененные поля, а пустые сохранения пропускает"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create(username='dirty_user')
+        self.user = User.objects.select_related('profile').get(username='dirty_user')
+        self.profile = self.user.profile
+
+    def test_unchanged_save_is_skipped(self):
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+    def test_save_writes_only_changed_fields(self):
+        self.profile.theme = 'dark'
+        with CaptureQueriesContext(connection) as queries:
+            self.profile.save()
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"theme"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"ai_personality"', sql)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.theme, 'dark')
+
+    def test_deferred_field_assignment_is_saved(self):
+        profile = UserProfile.objects.only('id').get(pk=self.profile.pk)
+        profile.language = 'en'
+        profile.save()
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).language, 'en')
+
+    def test_quota_refresh_does_not_dirty_profile(self):
+        quota.reserve(self.profile, quota.CHAT_REQUESTS)
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+    def test_login_updates_only_user(self):
+        with self.assertNumQueries(1):
+            update_last_login(None, self.user)
+
+    def test_user_save_does_not_load_profile(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_authenticated_request_writes_nothing(self):
+        token = Token.objects.create(user=self.user)
+        headers = {'Authorization': f'Token {token.key}'}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/users/profile/', headers=headers)
+        self.assertEqual([q['sql'] for q in queries if not q['sql'].startswith('SELECT')], [])
+
+
+@override_settings(AUTH_TOKEN_CACHE_TIMEOUT=300)
+class CachedTokenAuthenticationTests(TestCase):
+    """Аутентификация по токену из кэша вместе с профилем"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='auth_user')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    def test_warm_cache_needs_no_queries(self):
+        self.client.get('/api/users/profile/', headers=self.headers)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/profile/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_update_invalidates(self):
+        self.client.get('/api/users/profile/', headers=self.headers)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.theme = 'dark'
+        profile.save()
+        with self.assertNumQueries(1):
+            self.client.get('/api/users/profile/', headers=self.headers)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/api/users/profile/', headers=self.headers)
+        self.token.delete()
+        response = self.client.get('/api/users/profile/', headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_deleted_in_another_process(self):
+        self.client.get('/api/users/profile/', headers=self.headers)
+        # Другой процесс со своим подключением к общему кэшу удаляет токен
+        with mock.patch('users.authentication.cache', caches.create_connection('default')):
+            self.token.delete()
+        response = self.client.get('/api/users/profile/', headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(AUTH_TOKEN_CACHE_TIMEOUT=0)
+    def test_disabled_cache_reads_token_every_time(self):
+        self.client.get('/api/users/profile/', headers=self.headers)
+        # Сигнал в этот процесс не приходит: локальный кэш не был бы сброшен
+        Token.objects.filter(pk=self.token.pk)._raw_delete(connection.alias)
+        response = self.client.get('/api/users/profile/', headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+
+TEST_BOT_TOKEN = '123456:test-bot-token'
+
+
+def signed_init_data(**fields):
+    """initData, подписанные так же, как это делает Telegram"""
+    data = {'auth_date': str(int(time.time())), 'query_id': 'q1', **fields}
+    check = '\n'.join(f'{key}={value}' for key, value in sorted(data.items()))
+    secret = hmac.new(b'WebAppData', TEST_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data['hash'] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(data)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN=TEST_BOT_TOKEN, TELEGRAM_AUTH_CACHE_TIMEOUT=3600)
+class TelegramAuthTests(TestCase):
+    """Вход через Telegram WebApp и кэш проверенных initData"""
+    url = '/api/users/auth/telegram/'
+
+    def setUp(self):
+        cache.clear()
+        self.init_data = signed_init_data(user=json.dumps({'id': 42, 'username': 'tg_tester'}))
+
+    def login(self, init_data):
+        return self.client.post(self.url, {'init_data': init_data}, content_type='application/json')
+
+    def test_replay_is_served_from_cache(self):
+        token = self.login(self.init_data).json()['token']
+        with self.assertNumQueries(0):
+            response = self.login(self.init_data)
+        self.assertEqual(response.json(), {'token': token})
+
+    def test_tampered_init_data_misses_cache(self):
+        self.login(self.init_data)
+        tampered = self.init_data.replace('tg_tester', 'tg_intruder')
+        self.assertEqual(self.login(tampered).status_code, 400)
+        self.assertFalse(User.objects.filter(username='tg_intruder').exists())
+
+    def test_deleted_token_is_not_replayed(self):
+        old_token = self.login(self.init_data).json()['token']
+        Token.objects.get(key=old_token).delete()
+
+        new_token = self.login(self.init_data).json()['token']
+        self.assertNotEqual(new_token, old_token)
+        self.assertTrue(Token.objects.filter(key=new_token, user__username='tg_tester').exists())
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and connection.settings_dict['TEST']['NAME'] is None,
+    'тестовая БД SQLite в памяти не допускает параллельных записей'
+)
+class QuotaConcurrencyTests(TransactionTestCase):
+    """Нагрузочная проверка: параллельные запросы не превышают лимит"""
+    THREADS = 16
+    ATTEMPTS_PER_THREAD = 5
+
+    def test_parallel_reserve_does_not_overspend(self):
+        user = User.objects.create(username='quota_stress')
+        UserProfile.objects.filter(user=user).update(plan='plus')
+        limit = UserProfile.AI_CHAT_REQUESTS_LIMITS['plus']
+        barrier = threading.Barrier(self.THREADS)
+        granted = []
+        errors = []
+
+        def worker():
+            try:
+                profile = UserProfile.objects.get(user=user)
+                barrier.wait()
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    if quota.reserve(profile, quota.CHAT_REQUESTS):
+                        granted.append(1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(granted), limit)
+        self.assertEqual(UserProfile.objects.get(user=user).ai_chat_requests_used, limit)
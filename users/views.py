@@ -8,7 +8,8 @@ from django.conf import settings
 from urllib import request as urlrequest
 import json
 import time
-from .telegram import verify_telegram_init_data
+from . import quota
+from .telegram import cache_token, get_cached_token, verify_telegram_init_data
 from .models import UserProfile
 from .serializers import UserWithProfileSerializer, UserProfileSerializer, AIUsageUpdateSerializer
 
@@ -53,20 +54,13 @@ def update_ai_usage(request):
 @permission_classes([IsAuthenticated])  
 def increment_ai_descriptions(request):
     """Увеличить счетчик использованных AI описаний"""
-    try:
-        profile = request.user.profile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
-    
-    if profile.ai_descriptions_used >= profile.ai_descriptions_limit:
+    profile = quota.profile_for(request.user)
+    if not quota.reserve(profile, quota.DESCRIPTIONS):
         return Response(
             {'error': f'Превышен лимит AI описаний: {profile.ai_descriptions_limit}'},
             status=status.HTTP_429_TOO_MANY_REQUESTS
         )
     
-    profile.ai_descriptions_used += 1
-    profile.save()
-    
     return Response({
         'ai_descriptions_used': profile.ai_descriptions_used,
         'ai_descriptions_limit': profile.ai_descriptions_limit
@@ -77,19 +71,12 @@ def increment_ai_descriptions(request):
 @permission_classes([IsAuthenticated])
 def increment_ai_chat_requests(request):
     """Увеличить счетчик использованных AI чат-запросов"""
-    try:
-        profile = request.user.profile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
-    
-    if profile.ai_chat_requests_used >= profile.ai_chat_requests_limit:
+    profile = quota.profile_for(request.user)
+    if not quota.reserve(profile, quota.CHAT_REQUESTS):
         return Response(
             {'error': f'Превышен лимит AI чат-запросов: {profile.ai_chat_requests_limit}'},
             status=status.HTTP_429_TOO_MANY_REQUESTS
         )
-    
-    profile.ai_chat_requests_used += 1
-    profile.save()
 
     return Response({
         'ai_chat_requests_used': profile.ai_chat_requests_used,
@@ -108,16 +95,29 @@ def telegram_auth(request):
     if not init_data:
         return Response({'detail': 'Init data is required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    # Повторный запуск с теми же initData: без проверки подписи и запросов к БД
+    token_key = get_cached_token(init_data)
+    if token_key:
+        return Response({'token': token_key})
+    
     data = verify_telegram_init_data(init_data, settings.TELEGRAM_BOT_TOKEN)
     if not data or 'user' not in data:
         return Response({'detail': 'Invalid auth data'}, status=status.HTTP_400_BAD_REQUEST)
     tg_user = data['user']
     username = tg_user.get('username') or f"tg_{tg_user['id']}"
-    user, _ = User.objects.get_or_create(
-        username=username,
-        defaults={'first_name': tg_user.get('first_name', ''), 'last_name': tg_user.get('last_name', '')}
-    )
-    token, _ = Token.objects.get_or_create(user=user)
+    
+    # Существующий пользователь и его токен — одним запросом с JOIN
+    user = User.objects.select_related('auth_token').filter(username=username).first()
+    token = user.auth_token if user is not None and hasattr(user, 'auth_token') else None
+    if user is None:
+        user, _ = User.objects.get_or_create(
+            username=username,
+            defaults={'first_name': tg_user.get('first_name', ''), 'last_name': tg_user.get('last_name', '')}
+        )
+    if token is None:
+        token, _ = Token.objects.get_or_create(user=user)
+    
+    cache_token(init_data, int(data['auth_date']), token.key, user.pk, settings.TELEGRAM_AUTH_CACHE_TIMEOUT)
     return Response({'token': token.key})
 
 